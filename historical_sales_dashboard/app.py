@@ -1,8 +1,10 @@
 import streamlit as st
-import time
+import os
+import json
 from datetime import datetime
-import requests
 from streamlit_lottie import st_lottie
+from utils.profiling import profile_page
+from utils.kpis import kpi_snapshot
 
 # === CONFIGURE PAGE ===
 st.set_page_config(page_title="Magic Dashboard", layout="wide")
@@ -86,6 +88,34 @@ button[kind="primary"] {
   padding: 1rem;
   font-size: 15px;
 }
+.typewriter {
+  overflow: hidden;
+  white-space: nowrap;
+  width: 0;
+  animation: typing 0.9s steps(45, end) forwards, fade-out 0.3s ease 1.4s forwards;
+}
+@keyframes typing {
+  to { width: 100%; }
+}
+@keyframes fade-out {
+  to { opacity: 0; height: 0; margin: 0; }
+}
+@property --revenue {
+  syntax: '<integer>';
+  initial-value: 0;
+  inherits: false;
+}
+.revenue-counter {
+  font-size: 2.25rem;
+  counter-reset: revenue var(--revenue);
+  animation: count-up 0.5s ease-out forwards;
+}
+.revenue-counter::after {
+  content: "$" counter(revenue);
+}
+@keyframes count-up {
+  to { --revenue: var(--target); }
+}
 @media (max-width: 768px) {
   .section {
     padding: 1rem;
@@ -97,10 +127,21 @@ button[kind="primary"] {
 </style>
 """, unsafe_allow_html=True)
 
+# === Animations (opt-in, rendered by the browser so they never hold up the page) ===
+animations = st.sidebar.toggle("✨ Play animations", value=False)
+profiler = profile_page("Home")
+
+# Precomputed from the branch CSVs (utils/kpis.py); the home page never aggregates
+kpis, kpis_stale = kpi_snapshot()
+
+
+def signed(value, suffix="%"):
+    return f"{value:+.1f}{suffix}" if value is not None else None
+
 # === Navigation Buttons ===
 st.markdown('<div class="section">', unsafe_allow_html=True)
 st.markdown("### 🔀 Navigate Between Pages")
-col1, col2, col3, col4 = st.columns(4)
+col1, col2, col3, col4, col5 = st.columns(5)
 with col1:
     if st.button("📊 Lifecycle Comparison"):
         st.switch_page("pages/1_Lifecycle_Comparison.py")
@@ -113,19 +154,36 @@ with col3:
 with col4:
     if st.button("👥 Customer Analysis"):
         st.switch_page("pages/4_Customer_Analysis.py")
+with col5:
+    if st.button("💸 Receivables"):
+        st.switch_page("pages/5_Receivables.py")
 st.markdown('</div>', unsafe_allow_html=True)
 
 # === Smart Alert ===
 st.markdown('<div class="section">', unsafe_allow_html=True)
-st.warning("⚠️ WA branch has dropped 5% compared to last week.")
+for alert in kpis["alerts"]:
+    st.warning(f"⚠️ {alert['branch']} branch has dropped {-alert['change_pct']:.0f}% compared to the previous week "
+               f"(week of {alert['week']}).")
+if not kpis["alerts"]:
+    st.success("✅ No branch dropped week-over-week.")
+for branch in kpis.get("receivables", []):
+    if branch["alert"]:
+        st.warning(f"💸 {branch['branch']}: ${branch['overdue_90']:,.0f} of ${branch['outstanding']:,.0f} "
+                   f"outstanding is more than 90 days overdue.")
 st.markdown('</div>', unsafe_allow_html=True)
 
 # === Lottie Animation ===
-def load_lottieurl(url):
-    r = requests.get(url)
-    return r.json() if r.status_code == 200 else None
+# Bundled with the app (assets/) so the first paint never waits on the network
+@st.cache_resource
+def load_lottie_asset(name):
+    path = os.path.join(os.path.dirname(__file__), "assets", name)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-lottie_icon = load_lottieurl("https://lottie.host/dfca40d5-6ae3-49aa-bae7-ef28e881041c/synMYkzwXS.json")
+lottie_icon = load_lottie_asset("magic_lottie.json")
 if lottie_icon:
     with st.container():
         st_lottie(lottie_icon, height=200, key="magic")
@@ -133,12 +191,9 @@ if lottie_icon:
 # === Welcome Animation ===
 st.markdown('<div class="section">', unsafe_allow_html=True)
 welcome_msg = "✨ Welcome to Your Enhanced Magic Dashboard ✨"
-container = st.empty()
-for i in range(len(welcome_msg) + 1):
-    container.markdown(f"<h3>{welcome_msg[:i]}</h3>", unsafe_allow_html=True)
-    time.sleep(0.02)
-# Optional: remove white gap
-container.empty()
+if animations:
+    # Types out, then fades away (CSS), leaving no white gap behind
+    st.markdown(f'<h3 class="typewriter">{welcome_msg}</h3>', unsafe_allow_html=True)
 st.markdown('</div>', unsafe_allow_html=True)
 
 # === Persona Section ===
@@ -166,14 +221,19 @@ elif now.month == 6:
 # === KPI Cards ===
 st.markdown('<div class="section">', unsafe_allow_html=True)
 st.subheader("📊 Key KPIs at a Glance")
-kpis = {
-    "Monthly Revenue": ("₹1.2M", "+5%"),
-    "Customer Growth": ("8,200", "+2.1%"),
-    "Retention Rate": ("76%", "-1.2%"),
+retention = kpis["retention"]["rate"]
+cards = {
+    f"Monthly Revenue ({kpis['revenue']['month']})":
+        (f"${kpis['revenue']['value'] / 1e6:,.2f}M", signed(kpis["revenue"]["change_pct"])),
+    f"Active Customers ({kpis['customers']['quarter']})":
+        (f"{kpis['customers']['active']:,}", signed(kpis["customers"]["change_pct"])),
+    f"Retention Rate ({kpis['retention']['quarter']})":
+        (f"{retention:.0f}%" if retention is not None else "n/a", signed(kpis["retention"]["change_pts"], " pts")),
 }
-cols = st.columns(len(kpis))
-for i, (label, (value, delta)) in enumerate(kpis.items()):
+cols = st.columns(len(cards))
+for i, (label, (value, delta)) in enumerate(cards.items()):
     cols[i].metric(label, value, delta)
+st.caption(f"From invoices up to {kpis['as_of']}" + (" · refreshing after a data change" if kpis_stale else ""))
 st.markdown('</div>', unsafe_allow_html=True)
 
 # === ROI Calculator ===
@@ -208,9 +268,10 @@ st.subheader("🤖 Ask the Dashboard a Question")
 q = st.text_input("What would you like to know?")
 if q:
     if "sales" in q.lower():
-        st.info("💰 Sales this month crossed ₹1.8M")
+        st.info(f"💰 Sales in {kpis['revenue']['month']} reached ${kpis['revenue']['value']:,.0f}")
     elif "growth" in q.lower():
-        st.info("📈 Growth rate is steady at 8.5%")
+        st.info(f"📈 Active customers changed {signed(kpis['customers']['change_pct']) or 'n/a'} "
+                f"in {kpis['customers']['quarter']}")
     else:
         st.warning("🤔 I'm still learning. Try asking about 'sales' or 'growth'")
 st.markdown('</div>', unsafe_allow_html=True)
@@ -226,22 +287,20 @@ st.markdown('</div>', unsafe_allow_html=True)
 # === Quarterly Revenue Counter ===
 st.markdown('<div class="section">', unsafe_allow_html=True)
 st.subheader("📈 Quarterly Revenue Count")
-target = 18000
-placeholder = st.empty()
-for i in range(0, target + 1, 800):
-    placeholder.metric("Quarterly Revenue", f"${i:,}")
-    time.sleep(0.02)
+target = round(kpis["quarter_revenue"]["value"])
+if animations:
+    st.markdown(f'<div class="revenue-counter" style="--target: {target}"></div>', unsafe_allow_html=True)
+else:
+    st.metric(f"Quarterly Revenue ({kpis['quarter_revenue']['quarter']})", f"${target:,}")
 st.markdown('</div>', unsafe_allow_html=True)
 
 # === Branch Progress ===
 st.markdown('<div class="section">', unsafe_allow_html=True)
 st.subheader("📍 Branch Performance")
-st.write("**WA Branch**")
-st.progress(0.72)
-st.write("**NSW Branch**")
-st.progress(0.55)
-st.write("**QLD Branch**")
-st.progress(0.81)
+for branch in kpis["branches"]:
+    st.write(f"**{branch['branch']} Branch** - {branch['quarter']} to date: ${branch['to_date']:,.0f} "
+             f"of last quarter's ${branch['previous']:,.0f}")
+    st.progress(branch["progress"])
 st.markdown('</div>', unsafe_allow_html=True)
 
 # === Flip Cards ===
@@ -309,3 +368,5 @@ st.markdown("""
     <p>Made with ❤️ by Your Nagasai Petnikoti from IFA</p>
 </div>
 """, unsafe_allow_html=True)
+
+profiler.finish()
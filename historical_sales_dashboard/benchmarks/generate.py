@@ -0,0 +1,118 @@
+import os
+import csv
+import argparse
+import numpy as np
+import pandas as pd
+
+# Synthetic branch invoice exports in the same 18-column layout and text
+# format as data/WA.CSV (quoted fields, 25.8.2022 dates, "5,621.08" amounts).
+#   python -m benchmarks.generate --scale 100 --customers 2000 --years 6 --out /tmp/bench_data
+
+COLUMNS = [
+    "Entity Name", "Branch Region", "Branch", "Division", "Due Date", "Top Level Customer ID",
+    "Top Level Customer Name", "Customer ID", "Customer", "Billing Group ID", "Billing Group",
+    "Invoice ID", "Invoice #", "Issue Date", "Total", "Outstanding", "Delivery", "Status",
+]
+ENTITIES = {
+    "WA": "Connect Resources Pty Ltd",
+    "NSW": "Connect Resources (NSW) Pty Ltd",
+    "QLD": "Connect Resources (QLD) Pty Ltd",
+}
+# Row count and per-branch share of the shipped data (WA 3,325 / NSW 3,230 / QLD 1,686)
+SHIPPED_ROWS = 8241
+BRANCH_SHARE = {"WA": 0.40, "NSW": 0.39, "QLD": 0.21}
+
+
+def branch_shares(count=len(BRANCH_SHARE)):
+    """The shipped branches' shares, or `count` equal branches (WA, NSW, QLD, B04, ...)."""
+    if count == len(BRANCH_SHARE):
+        return dict(BRANCH_SHARE)
+    names = (list(BRANCH_SHARE) + [f"B{i:02d}" for i in range(len(BRANCH_SHARE) + 1, count + 1)])[:count]
+    return {name: 1 / count for name in names}
+
+
+STATUSES = ["Sent", "Viewed", "Paid", "Draft"]
+
+
+def generate_branch(branch, rows, customers, years, end, rng, first_invoice_id=1):
+    start = end - pd.DateOffset(years=years)
+    days = (end - start).days
+    issue = start + pd.to_timedelta(np.sort(rng.integers(0, days, rows)), unit="D")
+    due = issue + pd.to_timedelta(rng.choice([7, 14, 30], rows), unit="D")
+
+    # A few large customers and a long tail, like the real exports
+    weights = 1.0 / np.arange(1, customers + 1) ** 0.8
+    customer_ids = rng.choice(customers, rows, p=weights / weights.sum()) + 1
+    names = np.char.add("Customer ", np.char.zfill(customer_ids.astype(str), 5))
+
+    total = np.round(rng.lognormal(7.2, 1.0, rows), 2)
+    status = rng.choice(STATUSES, rows, p=[0.55, 0.30, 0.12, 0.03])
+    outstanding = np.where(status == "Paid", 0.0, total)
+    invoice_ids = np.arange(first_invoice_id, first_invoice_id + rows)
+
+    frame = pd.DataFrame({
+        "Entity Name": ENTITIES.get(branch, f"Connect Resources ({branch}) Pty Ltd"),
+        "Branch Region": "",
+        "Branch": "",
+        "Division": "",
+        "Due Date": _date_text(due),
+        "Top Level Customer ID": customer_ids,
+        "Top Level Customer Name": names,
+        "Customer ID": customer_ids,
+        "Customer": names,
+        "Billing Group ID": "",
+        "Billing Group": "",
+        "Invoice ID": invoice_ids,
+        "Invoice #": np.char.add(f"{branch}", invoice_ids.astype(str)),
+        "Issue Date": _date_text(issue),
+        "Total": _amount_text(total),
+        "Outstanding": _amount_text(outstanding),
+        "Delivery": rng.choice(["Email/PDF", "Post"], rows, p=[0.9, 0.1]),
+        "Status": status,
+    })
+    return frame[COLUMNS]
+
+
+def generate_dataset(out_dir, rows, customers=200, years=3, seed=0, end="2025-03-07", branches=len(BRANCH_SHARE)):
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end)
+    next_id = 1
+    paths = {}
+    for branch, share in branch_shares(branches).items():
+        branch_rows = max(int(rows * share), 1)
+        frame = generate_branch(branch, branch_rows, customers, years, end, rng, next_id)
+        next_id += branch_rows
+        paths[branch] = os.path.join(out_dir, f"{branch}.CSV")
+        frame.to_csv(paths[branch], index=False, quoting=csv.QUOTE_ALL)
+    return paths
+
+
+def _date_text(dates):
+    dates = pd.Series(dates)
+    return (dates.dt.day.astype(str) + "." + dates.dt.month.astype(str) + "." + dates.dt.year.astype(str)).to_numpy()
+
+
+def _amount_text(amounts):
+    return pd.Series(amounts).map("{:,.2f}".format).to_numpy()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic branch invoice CSVs.")
+    parser.add_argument("--scale", type=float, default=10, help="multiple of the shipped data's row count")
+    parser.add_argument("--rows", type=int, help="total rows across all branches (overrides --scale)")
+    parser.add_argument("--customers", type=int, default=200, help="top-level customers per branch")
+    parser.add_argument("--years", type=int, default=3, help="years of history")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--branches", type=int, default=len(BRANCH_SHARE), help="number of branch files")
+    parser.add_argument("--out", required=True, help="output directory")
+    args = parser.parse_args(argv)
+
+    rows = args.rows or int(SHIPPED_ROWS * args.scale)
+    for branch, path in generate_dataset(args.out, rows, args.customers, args.years, args.seed,
+                                         branches=args.branches).items():
+        print(f"{branch}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import platform
+import argparse
+import subprocess
+import statistics
+import numpy as np
+import pandas as pd
+from benchmarks.generate import SHIPPED_ROWS, generate_dataset
+from utils import loader, rollups
+from utils.branches import branch_files
+from utils.alerts import spend_drop_alerts
+
+# Times each dashboard stage in isolation on synthetic data and writes the
+# results as JSON; --compare fails (exit 1) when a stage got slower than the
+# tolerance against an earlier results file.
+#   python -m benchmarks.run --scale 100 --out bench.json
+#   python -m benchmarks.run --scale 100 --compare bench.json
+
+
+class StageSkipped(Exception):
+    """Raised by a stage that cannot run here (e.g. a missing optional dependency)."""
+
+
+# Each stage gets the shared state dict and returns nothing. Stages reuse the
+# rollup cube an earlier stage built, building it untimed when run alone.
+def stage_load(state):
+    for path in state["paths"].values():
+        with open(path, "rb") as f:
+            f.read()
+
+
+def stage_parse(state):
+    state["frames"] = {branch: loader.read_invoices(path, branch)[0] for branch, path in state["paths"].items()}
+
+
+def stage_snapshot_read(state):
+    if loader.feather is None:
+        raise StageSkipped("pyarrow not installed")
+    for branch, path in state["paths"].items():
+        snapshot = os.path.join(state["data_dir"], f"{branch}.bench.feather")
+        if not os.path.exists(snapshot):
+            loader.write_snapshot(snapshot, loader.read_invoices(path, branch)[0], {})
+        loader.read_snapshot(snapshot)
+
+
+def stage_concurrent_load(state):
+    # Cold start: every discovered branch into a fresh memo, in parallel
+    # (from the snapshots once an earlier run has written them)
+    with loader.staged_sources({}):
+        loader.load_branch_data()
+
+
+def stage_weekly_aggregation(state):
+    state["cube"] = rollups.build_rollups(rollups.data_version())
+
+
+def stage_drop_alerts(state):
+    pivot = _cube(state).quarterly_by_customer()
+    spend_drop_alerts(pivot, threshold=30, lag=4)
+
+
+def stage_rolling_windows(state):
+    # Weekly Trends sliders: build the prefix-sum index, then sweep every
+    # rolling window for each branch
+    from utils.rolling import RollingIndex, rolling_mean
+
+    cube = _cube(state)
+    index = RollingIndex(cube.facts, cube.customers)
+    for branch in index.branches:
+        weekly = index.weekly_totals([branch]).to_numpy()
+        for window in range(2, 13):
+            rolling_mean(weekly, window)
+        for num_weeks in range(4, 27):
+            index.top_customers([branch], num_weeks, n=10)
+
+
+def stage_target_build(state):
+    # Benchmark Model: every branch against each single-branch benchmark and
+    # its leave-one-out peer group, in one batch
+    from utils.targets import target_model
+
+    matrix = _cube(state).weekly_matrix()
+    benchmarks = {branch: [branch] for branch in matrix.index}
+    benchmarks.update({f"{branch} peers": [other for other in matrix.index if other != branch]
+                       for branch in matrix.index})
+    target_model(matrix, benchmarks, "compound")
+
+
+def stage_prophet_fit(state):
+    from utils.forecast import train_forecast
+
+    weekly = _cube(state).weekly_sales(["WA"]).rename_axis("ds").reset_index(name="y")
+    train_forecast(weekly, 12)
+
+
+def stage_chart_render(state):
+    # Server-side share of a chart: building and serializing the Vega-Lite spec
+    from utils.charts import time_series
+
+    weekly = _cube(state).weekly_sales(["WA"]).rename_axis("ds").reset_index(name="y")
+    weekly["Rolling Avg"] = weekly["y"].rolling(4).mean()
+    time_series(weekly, "ds", {"y": "Weekly Sales", "Rolling Avg": "4-Week Avg"}).to_json()
+
+
+def _cube(state):
+    if "cube" not in state:
+        state["cube"] = rollups.build_rollups(rollups.data_version())
+    return state["cube"]
+
+
+STAGES = {
+    "load": stage_load,
+    "parse": stage_parse,
+    "snapshot_read": stage_snapshot_read,
+    "concurrent_load": stage_concurrent_load,
+    "weekly_aggregation": stage_weekly_aggregation,
+    "drop_alerts": stage_drop_alerts,
+    "rolling_windows": stage_rolling_windows,
+    "target_build": stage_target_build,
+    "prophet_fit": stage_prophet_fit,
+    "chart_render": stage_chart_render,
+}
+
+
+def run_stages(state, stages, repeat):
+    results = {}
+    for name in stages:
+        runs = []
+        try:
+            # One untimed run first so lazy imports don't land in the numbers
+            STAGES[name](state)
+            for _ in range(repeat):
+                start = time.perf_counter()
+                STAGES[name](state)
+                runs.append(time.perf_counter() - start)
+        except StageSkipped as skipped:
+            results[name] = {"skipped": str(skipped)}
+            continue
+        results[name] = {"median_s": statistics.median(runs), "min_s": min(runs), "runs_s": runs}
+        print(f"{name:>20}: {results[name]['median_s'] * 1000:10.1f} ms")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results["stages"].items():
+        before = baseline.get("stages", {}).get(name, {})
+        if "median_s" not in result or "median_s" not in before:
+            continue
+        ratio = result["median_s"] / max(before["median_s"], 1e-9)
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: {before['median_s']:.3f}s -> {result['median_s']:.3f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dashboard stages on synthetic invoices.")
+    parser.add_argument("--scale", type=float, default=10, help="multiple of the shipped data's row count")
+    parser.add_argument("--customers", type=int, default=200)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--branches", type=int, default=3, help="number of generated branch files")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=list(STAGES))
+    parser.add_argument("--skip-prophet", action="store_true")
+    parser.add_argument("--data", help="reuse (or create) generated data in this directory")
+    parser.add_argument("--out", default="bench_output.json")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    args = parser.parse_args(argv)
+
+    stages = [s for s in args.stages if not (args.skip_prophet and s == "prophet_fit")]
+    rows = int(SHIPPED_ROWS * args.scale)
+    data_dir = args.data or tempfile.mkdtemp(prefix="dashboard_bench_")
+    if not branch_files(data_dir):
+        start = time.perf_counter()
+        generate_dataset(data_dir, rows, args.customers, args.years, args.seed, branches=args.branches)
+        print(f"generated {rows:,} rows in {time.perf_counter() - start:.1f}s -> {data_dir}")
+    paths = {branch: os.path.join(data_dir, filename) for branch, filename in branch_files(data_dir).items()}
+
+    # Point the loader at the synthetic files (its snapshot cache goes there too)
+    loader.DATA_DIR = data_dir
+    loader.CACHE_DIR = os.path.join(data_dir, ".cache")
+    state = {"data_dir": data_dir, "paths": paths}
+
+    results = {
+        "meta": {
+            "scale": args.scale, "rows": rows, "branches": len(paths), "customers": args.customers, "years": args.years,
+            "seed": args.seed, "repeat": args.repeat, "python": platform.python_version(),
+            "pandas": pd.__version__, "numpy": np.__version__, "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "stages": run_stages(state, stages, args.repeat),
+    }
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results -> {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(__file__))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,74 +1,93 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from io import BytesIO
-from prophet import Prophet
-from sklearn.linear_model import LinearRegression
-import numpy as np
-from utils.loader import load_branch_data
+from utils.loader import load_branch_data, branch_rejected_rows
+from utils.rollups import load_rollups
+from utils.forecast import get_forecast
+from utils.alerts import spend_drop_alerts, LOOKBACKS
+from utils.profiling import profile_page, stage
+from utils.charts import time_series
+from utils.export import export_button
+from utils.result_cache import shared_result
+from utils.rolling import rolling_mean
+from utils.refresh import start_refresh_worker
 
 st.set_page_config(layout="wide")
 st.title("📊 Weekly Sales Analysis & Forecast Dashboard")
+profiler = profile_page("Weekly Trends")
+start_refresh_worker()  # rebuilds in the background when data/ changes
 
-wa, nsw, qld = load_branch_data()
-branch = st.selectbox("🏢 Select Branch", ["WA", "NSW", "QLD"])
-data = {"WA": wa, "NSW": nsw, "QLD": qld}[branch]
 
-if "Issue Date" in data.columns and "Total" in data.columns:
-    # 🧼 Clean and prep data
-    data["Issue Date"] = pd.to_datetime(data["Issue Date"], dayfirst=True, errors="coerce")
-    data["Total"] = pd.to_numeric(data["Total"], errors="coerce")
-    data = data.dropna(subset=["Issue Date", "Total"])
-    data = data.sort_values("Issue Date")
-
-    # Time fields
-    data["Week"] = data["Issue Date"].dt.to_period("W").apply(lambda r: r.start_time)
-    data["Quarter"] = data["Issue Date"].dt.to_period("Q")
-    data["Year"] = data["Issue Date"].dt.year
-
-    # Weekly Aggregation
-    weekly = data.groupby("Week")["Total"].sum().reset_index()
+# Shared across sessions: keyed on the arguments and the invoice data version
+@shared_result
+def weekly_trends(branch, window):
+    weekly = load_rollups().rolling_index().weekly_totals([branch]).reset_index()
     weekly.columns = ["ds", "y"]
+    weekly["Rolling Avg"] = rolling_mean(weekly["y"], window)
+
+    x = pd.to_datetime(weekly["ds"]).map(pd.Timestamp.toordinal).to_numpy().reshape(-1, 1)
+    from sklearn.linear_model import LinearRegression
+
+    weekly["Trend"] = LinearRegression().fit(x, weekly["y"].to_numpy()).predict(x)
+    return weekly
+
+
+@shared_result
+def quarter_drop_alerts(branch):
+    pivot_qtr = load_rollups().quarterly_by_customer([branch])
+    if len(pivot_qtr) < 2:
+        return None
+    qoq_alerts = spend_drop_alerts(pivot_qtr, threshold=30, lag=LOOKBACKS["QoQ"], latest_only=True)
+    drop_alerts = pd.DataFrame(
+        {"% Drop from Last Quarter": -qoq_alerts["Drop %"].to_numpy()},
+        index=pd.Index(qoq_alerts["Customer"], name="Top Level Customer Name"))
+    return drop_alerts.sort_values(by="% Drop from Last Quarter")
+
+
+# Prefix-sum lookups on the cube's rolling index: any window is a subtraction
+# and a partial sort, so this is cheap enough to skip the result cache
+def top_customers(branch, num_weeks):
+    return load_rollups().rolling_index().top_customers([branch], num_weeks, n=10).reset_index()
 
+
+dataset = load_branch_data()   # {branch: invoices} for every branch file in data/
+branch = st.selectbox("🏢 Select Branch", list(dataset))
+data = dataset[branch]
+rejected = branch_rejected_rows(branch)
+if rejected:
+    st.warning(f"⚠️ {rejected} {branch} invoices skipped: unreadable Issue Date or Total.")
+
+if "Issue Date" in data.columns and "Total" in data.columns:
     # 📈 Weekly Sales with Rolling Average
+    # (weekly totals come pre-aggregated from the shared rollup cube)
     st.subheader(f"📈 Weekly Sales with Rolling Average - {branch}")
     window = st.slider("Select rolling window (weeks)", 2, 12, 4)
-    weekly["Rolling Avg"] = weekly["y"].rolling(window=window).mean()
+    with stage("weekly trends", "transform"):
+        weekly = weekly_trends(branch, window)
 
-    fig1, ax1 = plt.subplots(figsize=(12, 4))
-    sns.lineplot(data=weekly, x="ds", y="y", label="Weekly Sales", marker="o", color="#007ACC", ax=ax1)
-    sns.lineplot(data=weekly, x="ds", y="Rolling Avg", label=f"{window}-Week Avg", color="orange", ax=ax1)
-    ax1.set_title(f"{branch} - Weekly Sales & {window}-Week Avg")
-    ax1.set_ylabel("Total Sales")
-    ax1.grid(True)
-    st.pyplot(fig1)
+    with stage("rolling average chart", "render"):
+        st.altair_chart(time_series(weekly, "ds", {"y": "Weekly Sales", "Rolling Avg": f"{window}-Week Avg"},
+                                    title=f"{branch} - Weekly Sales & {window}-Week Avg", y_title="Total Sales"),
+                        width="stretch")
 
     # 📏 Linear Trend Line
     st.subheader("📏 Sales Trend - Linear Regression")
-    weekly["ds_ordinal"] = pd.to_datetime(weekly["ds"]).map(pd.Timestamp.toordinal)
-    x = weekly["ds_ordinal"].values.reshape(-1, 1)
-    y = weekly["y"].values
-    reg = LinearRegression().fit(x, y)
-    weekly["Trend"] = reg.predict(x)
-
-    fig2, ax2 = plt.subplots(figsize=(12, 4))
-    sns.lineplot(x=weekly["ds"], y=weekly["y"], label="Actual", marker="o", ax=ax2)
-    sns.lineplot(x=weekly["ds"], y=weekly["Trend"], label="Linear Fit", color="green", ax=ax2)
-    ax2.set_title("Trend Slope - Fitted Line")
-    ax2.grid(True)
-    st.pyplot(fig2)
+    with stage("trend chart", "render"):
+        st.altair_chart(time_series(weekly, "ds", {"y": "Actual", "Trend": "Linear Fit"},
+                                    title="Trend Slope - Fitted Line", dashed=["Linear Fit"]),
+                        width="stretch")
 
     # 🔮 Prophet Forecast
     st.subheader("🔮 Prophet Forecast (Next 12 Weeks)")
-    model = Prophet()
-    model.fit(weekly[["ds", "y"]])
+    with st.spinner("Fitting forecast model..."):
+        model, forecast, stale = get_forecast(branch, weekly, horizon=12)
+    if stale:
+        st.info("🔄 Sales data changed - refitting in the background. Showing the last forecast until it's ready.")
 
-    future = model.make_future_dataframe(periods=12, freq="W")
-    forecast = model.predict(future)
-
-    fig3 = model.plot(forecast)
-    st.pyplot(fig3)
+    with stage("forecast chart", "render"):
+        history = forecast[["ds", "yhat", "yhat_lower", "yhat_upper"]].merge(weekly[["ds", "y"]], on="ds", how="left")
+        st.altair_chart(time_series(history, "ds", {"y": "Actual", "yhat": "Forecast"}, points=["Actual"],
+                                    band=("yhat_lower", "yhat_upper")),
+                        width="stretch")
 
     st.dataframe(
         forecast[["ds", "yhat", "yhat_lower", "yhat_upper"]].tail(12).rename(columns={
@@ -81,44 +100,22 @@ if "Issue Date" in data.columns and "Total" in data.columns:
     # ⚠️ Quarter over Quarter % Drop
     st.subheader("⚠️ Customer Drop >30%: Quarter-over-Quarter")
 
-    qtr_customer_sales = data.groupby(["Top Level Customer Name", "Quarter"])["Total"].sum().reset_index()
-    pivot_qtr = qtr_customer_sales.pivot(index="Top Level Customer Name", columns="Quarter", values="Total")
-    pivot_qtr = pivot_qtr.apply(pd.to_numeric, errors='coerce')
-    pct_change_qtr = pivot_qtr.pct_change(axis=1) * 100
-
-    if pct_change_qtr.shape[1] >= 2:
-        latest_qtr = pct_change_qtr.columns[-1]
-        drop_alerts = pct_change_qtr[pct_change_qtr[latest_qtr] < -30][[latest_qtr]].dropna().round(1)
-        drop_alerts.columns = ["% Drop from Last Quarter"]
-        drop_alerts = drop_alerts.sort_values(by="% Drop from Last Quarter")
+    drop_alerts = quarter_drop_alerts(branch)
 
+    if drop_alerts is not None:
         st.dataframe(drop_alerts.style.background_gradient(cmap="Reds").format("{:+.1f}%"))
 
-        def to_excel(df):
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df.to_excel(writer, index=True, sheet_name="Alerts")
-            return output.getvalue()
-
-        st.download_button(
-            label="📥 Download Alerts Report",
-            data=to_excel(drop_alerts),
-            file_name=f"{branch}_Customer_Drops.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        export_button("📥 Download Alerts Report", drop_alerts, f"{branch}_Customer_Drops.xlsx",
+                      index=True, sheet_name="Alerts")
     else:
         st.info("Not enough quarters to calculate drop alerts.")
 
     # 👑 Top Customers - Rolling View
     st.subheader("👑 Top Customers in Rolling Weeks")
     num_weeks = st.slider("Rolling Weeks", 4, 26, 13)
-    recent_weeks = sorted(data["Week"].unique())[-num_weeks:]
-    rolling_data = data[data["Week"].isin(recent_weeks)]
-    top_customers = (
-        rolling_data.groupby("Top Level Customer Name")["Total"]
-        .sum().sort_values(ascending=False).head(10).reset_index()
-    )
-    st.dataframe(top_customers.rename(columns={"Total": f"Total Last {num_weeks} Weeks"}).style.format({f"Total Last {num_weeks} Weeks": "{:,.0f}"}))
+    st.dataframe(top_customers(branch, num_weeks).rename(columns={"Total": f"Total Last {num_weeks} Weeks"}).style.format({f"Total Last {num_weeks} Weeks": "{:,.0f}"}))
 
 else:
     st.error("❌ Missing required columns: 'Issue Date' and 'Total'")
+
+profiler.finish()
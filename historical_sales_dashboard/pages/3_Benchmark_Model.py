@@ -1,70 +1,59 @@
 import streamlit as st
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-from utils.loader import load_branch_data
+from utils.loader import branch_names, branch_rejected_rows
+from utils.rollups import load_rollups
+from utils.targets import target_model
+from utils.result_cache import shared_result
+from utils.profiling import profile_page, stage
+from utils.charts import time_series
+from utils.tables import paged_table
+from utils.export import export_button
+from utils.refresh import start_refresh_worker
 
 st.set_page_config(layout="wide")
-st.title("🎯 WA Benchmark-Based Target Model for NSW & QLD")
-
-# Load and preprocess
-wa, nsw, qld = load_branch_data()
-for df in [wa, nsw, qld]:
-    df["Issue Date"] = pd.to_datetime(df["Issue Date"], dayfirst=True, errors="coerce")
-    df["Total"] = pd.to_numeric(df["Total"], errors="coerce")
-    df.dropna(subset=["Issue Date", "Total"], inplace=True)
-
-# Weekly aggregation
-wa_weekly = wa.groupby(pd.Grouper(key="Issue Date", freq="W"))["Total"].sum().reset_index(name="WA Sales")
-nsw_weekly = nsw.groupby(pd.Grouper(key="Issue Date", freq="W"))["Total"].sum().reset_index(name="NSW Sales")
-qld_weekly = qld.groupby(pd.Grouper(key="Issue Date", freq="W"))["Total"].sum().reset_index(name="QLD Sales")
-
-min_len = min(len(wa_weekly), len(nsw_weekly), len(qld_weekly))
-wa_weekly, nsw_weekly, qld_weekly = wa_weekly.iloc[:min_len], nsw_weekly.iloc[:min_len], qld_weekly.iloc[:min_len]
-
-# WA growth rate
-wa_weekly["Growth"] = wa_weekly["WA Sales"].pct_change()
-wa_growth = wa_weekly["Growth"].mean()
-
-# Build targets for NSW and QLD
-def build_target_model(actual_df, sales_col, growth, label):
-    df = actual_df.copy()
-    initial = df[sales_col].iloc[0]
-    df["Target Sales"] = [initial * (1 + growth) ** i for i in range(len(df))]
-    df["Difference"] = df[sales_col] - df["Target Sales"]
-    df["Deviation %"] = (df["Difference"] / df["Target Sales"]) * 100
-    df["Branch"] = label
-    return df
-
-nsw_model = build_target_model(nsw_weekly, "NSW Sales", wa_growth, "NSW")
-qld_model = build_target_model(qld_weekly, "QLD Sales", wa_growth, "QLD")
-
-# Combine
-all_data = pd.concat([nsw_model[["Issue Date", "Branch", "NSW Sales", "Target Sales", "Difference", "Deviation %"]],
-                      qld_model[["Issue Date", "Branch", "QLD Sales", "Target Sales", "Difference", "Deviation %"]]])
-
-# Rename actual sales column to unify
-all_data["Actual Sales"] = all_data["NSW Sales"].combine_first(all_data["QLD Sales"])
-all_data.drop(columns=["NSW Sales", "QLD Sales"], inplace=True)
+title = st.empty()  # filled once the benchmark is chosen
+profiler = profile_page("Benchmark Model")
+start_refresh_worker()  # rebuilds in the background when data/ changes
+
+# Load (weekly totals come pre-aggregated from the shared rollup cube)
+branches = branch_names()
+for name in branches:
+    if branch_rejected_rows(name):
+        st.warning(f"⚠️ {branch_rejected_rows(name)} {name} invoices skipped: unreadable Issue Date or Total.")
+
+PEER_GROUP = "Peer group (blend of the other branches)"
+GROWTH_LABELS = {"compound": "Compound weekly trend", "mean": "Average weekly % change"}
+controls = st.columns(2)
+benchmark = controls[0].selectbox("📏 Benchmark", branches + [PEER_GROUP])
+method = controls[1].selectbox("Growth rate", list(GROWTH_LABELS), format_func=GROWTH_LABELS.get)
+
+# Every branch is projected from its own first week on the shared weekly
+# calendar, at the benchmark's growth rate (utils/targets.py). The peer group
+# benchmarks each branch against the blend of all the other branches.
+@shared_result
+def benchmark_targets(benchmark, method):
+    matrix = load_rollups().weekly_matrix()
+    if benchmark != PEER_GROUP:
+        return target_model(matrix, {benchmark: [benchmark]}, method)
+    peers = {branch: [other for other in matrix.index if other != branch] for branch in matrix.index}
+    targets = target_model(matrix, peers, method)
+    return targets[targets["Benchmark"] == targets["Branch"]].reset_index(drop=True)
+
+with stage("target model", "model"):
+    all_data = benchmark_targets(benchmark, method).drop(columns="Benchmark")
+
+benchmark_name = "Peer-Group" if benchmark == PEER_GROUP else benchmark
+targeted = ", ".join(all_data["Branch"].unique())
+title.title(f"🎯 {benchmark_name} Benchmark-Based Target Model for {targeted}")
 
 # ---------------------- COMPARISON CHART ----------------------
-st.subheader("📈 Weekly Sales vs WA-Based Target")
-fig, ax = plt.subplots(figsize=(14, 5))
-for branch in all_data["Branch"].unique():
-    branch_df = all_data[all_data["Branch"] == branch]
-    sns.lineplot(data=branch_df, x="Issue Date", y="Actual Sales", label=f"{branch} Sales", linewidth=2)
-    sns.lineplot(data=branch_df, x="Issue Date", y="Target Sales", label=f"{branch} Target", linestyle="--")
-ax.set_title("Branch Sales vs WA-Based Target")
-ax.set_ylabel("Sales ($)")
-ax.grid(True, alpha=0.3)
-ax.legend()
-st.pyplot(fig)
-
-# ---------------------- KPI SCORECARD ----------------------
-st.subheader("📊 KPI Scorecard")
+st.subheader(f"📈 Weekly Sales vs {benchmark_name}-Based Target")
 scorecards = []
 for branch in all_data["Branch"].unique():
-    latest = all_data[all_data["Branch"] == branch].dropna().iloc[-1]
+    weeks = all_data[all_data["Branch"] == branch].dropna()
+    if weeks.empty:
+        continue
+    latest = weeks.iloc[-1]
     scorecards.append({
         "Branch": branch,
         "Actual": latest["Actual Sales"],
@@ -74,14 +63,30 @@ for branch in all_data["Branch"].unique():
     })
 
 kpi_df = pd.DataFrame(scorecards)
-kpi_cols = st.columns(len(kpi_df))
-for i, row in kpi_df.iterrows():
-    kpi_cols[i].metric(
-        f"{row['Branch']} Achievement",
-        f"${row['Actual']:,.0f}",
-        delta=f"{row['Deviation %']:.1f}%",
-        delta_color="inverse" if row["Deviation %"] < 0 else "normal"
-    )
+
+if kpi_df.empty:
+    # No branch has a week with both actual and target sales to chart or score
+    st.info(f"No weeks with both actual and {benchmark_name}-based target sales to compare yet.")
+else:
+    with stage("comparison chart", "render"):
+        comparison = all_data.pivot_table(index="Issue Date", columns="Branch", values=["Actual Sales", "Target Sales"])
+        comparison.columns = [f"{branch} {'Sales' if kind == 'Actual Sales' else 'Target'}" for kind, branch in comparison.columns]
+        labels = {col: col for col in sorted(comparison.columns)}
+        st.altair_chart(time_series(comparison.reset_index(), "Issue Date", labels,
+                                    title=f"Branch Sales vs {benchmark_name}-Based Target", y_title="Sales ($)",
+                                    dashed=[col for col in labels if col.endswith("Target")]),
+                        width="stretch")
+
+    # ---------------------- KPI SCORECARD ----------------------
+    st.subheader("📊 KPI Scorecard")
+    kpi_cols = st.columns(len(kpi_df))
+    for i, row in kpi_df.iterrows():
+        kpi_cols[i].metric(
+            f"{row['Branch']} Achievement",
+            f"${row['Actual']:,.0f}",
+            delta=f"{row['Deviation %']:.1f}%",
+            delta_color="inverse" if row["Deviation %"] < 0 else "normal"
+        )
 
 # ---------------------- DEVIATION TABLE ----------------------
 st.subheader("📋 Weekly Deviation Table")
@@ -97,16 +102,16 @@ def deviation_color(val):
 df_to_display = all_data[["Issue Date", "Branch", "Actual Sales", "Target Sales", "Difference", "Deviation %"]].copy()
 df_to_display = df_to_display.reset_index(drop=True)
 
-st.dataframe(
-    df_to_display.style
+with stage("deviation table", "render"):
+    paged_table(df_to_display, "deviation", style=lambda styler: styler
         .format({
+            "Issue Date": "{:%Y-%m-%d}",
             "Actual Sales": "${:,.0f}",
             "Target Sales": "${:,.0f}",
             "Difference": "${:,.0f}",
             "Deviation %": "{:+.1f}%"
         })
-        .applymap(deviation_color, subset=["Deviation %"])
-)
+        .map(deviation_color, subset=["Deviation %"]))
 
 # ---------------------- QUARTERLY COMPARISON ----------------------
 st.subheader("📆 Quarterly Sales Comparison")
@@ -118,5 +123,6 @@ st.bar_chart(quarter_pivot)
 # ---------------------- DOWNLOAD ----------------------
 st.subheader("📥 Download Full Weekly Comparison")
 export_df = all_data[["Issue Date", "Branch", "Actual Sales", "Target Sales", "Difference", "Deviation %"]]
-csv_data = export_df.to_csv(index=False).encode("utf-8")
-st.download_button("⬇️ Download CSV", csv_data, "branch_vs_target.csv", "text/csv")
+export_button("⬇️ Download CSV", export_df, "branch_vs_target.csv")
+
+profiler.finish()
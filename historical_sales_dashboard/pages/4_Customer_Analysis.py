@@ -1,75 +1,123 @@
 import streamlit as st
 import pandas as pd
-import seaborn as sns
-from utils.loader import load_branch_data
+from utils.loader import branch_rejected_rows, load_branch_data
+from utils.rollups import load_rollups, data_version
+from utils.customers import load_customer_index, customer_invoices
+from utils.alerts import spend_drop_alerts, LOOKBACKS
+from utils.profiling import profile_page, stage
+from utils.tables import paged_table
+from utils.export import export_button, invoice_chunks
+from utils.result_cache import shared_result
+from utils.refresh import start_refresh_worker
 
 st.set_page_config(layout="wide")
 st.title("🧍 Customer Spend Breakdown, Trends & Drop Alerts")
+profiler = profile_page("Customer Analysis")
+start_refresh_worker()  # rebuilds in the background when data/ changes
 
-# -------------------- Load and Merge --------------------
-wa, nsw, qld = load_branch_data()
-wa["Branch"] = "WA"
-nsw["Branch"] = "NSW"
-qld["Branch"] = "QLD"
-df = pd.concat([wa, nsw, qld], ignore_index=True)
+
+MATCH_LIMIT = 20   # customers offered per search
+
+
+# Shared across sessions: keyed on the arguments and the invoice data version
+@shared_result
+def customer_weekly(branches, customer):
+    # Only the customer's rows, fetched by position from the customer index
+    invoices = customer_invoices(customer, branches, ["Issue Date", "Total"])
+    issue = invoices["Issue Date"]
+    week = (issue.dt.normalize() - pd.to_timedelta(issue.dt.dayofweek, unit="D")).rename("Week")
+    return invoices.groupby(week)["Total"].sum()
+
+
+@shared_result
+def earliest_invoices(branches, rows=100):
+    # Earliest `rows` per branch, then overall: never sorts the full history
+    frames = [frame.nsmallest(rows, "Issue Date") for frame in load_branch_data(branches).values()]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True).sort_values("Issue Date", kind="stable").head(rows)
+
+
+@shared_result
+def quarterly_pivot(branches):
+    return load_rollups().quarterly_by_customer(branches)
+
+
+@shared_result
+def drop_alerts(branches, threshold, lag=None, rolling=None):
+    pivot = quarterly_pivot(branches)
+    if rolling:
+        return spend_drop_alerts(pivot, threshold=threshold, rolling=rolling)
+    return spend_drop_alerts(pivot, threshold=threshold, lag=lag)
+
+
+@shared_result
+def qoq_growth_rates(branches):
+    return quarterly_pivot(branches).pct_change().multiply(100).round(1)
+
+
+# -------------------- Load --------------------
+# Branch frames are memoized by the loader; the charts read the rollup cube
+# and the customer index built from them
+dataset = load_branch_data()
+for name in dataset:
+    if branch_rejected_rows(name):
+        st.warning(f"⚠️ {branch_rejected_rows(name)} {name} invoices skipped: unreadable Issue Date or Total.")
 
 # -------------------- Validation --------------------
 required_cols = ["Issue Date", "Total", "Top Level Customer Name", "Branch"]
-missing = [col for col in required_cols if col not in df.columns]
+columns = set().union(*(frame.columns for frame in dataset.values()))
+missing = [col for col in required_cols if col not in columns]
 if missing:
     st.error(f"Missing columns: {', '.join(missing)}")
-    st.stop()
-
-# -------------------- Preprocess --------------------
-df["Issue Date"] = pd.to_datetime(df["Issue Date"], errors='coerce')
-df = df.dropna(subset=["Issue Date", "Total", "Top Level Customer Name", "Branch"])
-df["Total"] = pd.to_numeric(df["Total"], errors="coerce")
-df["Quarter"] = df["Issue Date"].dt.to_period("Q")
-df["Week"] = df["Issue Date"].dt.to_period("W")
+    st.stop()   # an unfinished profiler run is closed by the next start_run()
 
 # -------------------- Filters --------------------
-branches = df["Branch"].unique().tolist()
+branches = list(dataset)
 selected_branches = st.multiselect("🏢 Select Branches", branches, default=branches)
-filtered_df = df[df["Branch"].isin(selected_branches)]
 
-customers = filtered_df["Top Level Customer Name"].unique().tolist()
-selected_customer = st.selectbox("👤 Select Customer", sorted(customers))
-customer_df = filtered_df[filtered_df["Top Level Customer Name"] == selected_customer]
+# Search the customer index instead of listing every customer in a dropdown
+customer_index = load_customer_index()
+search_cols = st.columns(2)
+query = search_cols[0].text_input("🔎 Find Customer", placeholder="Name or part of it; typos are fine")
+with stage("customer search", "transform"):
+    matches = customer_index.search(query, limit=MATCH_LIMIT, branches=selected_branches)
+selected_code = search_cols[1].selectbox(f"👤 Select Customer ({'top matches' if query else 'most invoices'})",
+                                         matches, format_func=customer_index.label)
+selected_customer = customer_index.label(selected_code) if selected_code is not None else None
 
 # -------------------- Weekly Spend Trend --------------------
-st.subheader(f"📅 Weekly Spend Trend: {selected_customer}")
-weekly = customer_df.groupby("Week")["Total"].sum().reset_index()
-if not weekly.empty:
-    st.line_chart(weekly.set_index("Week")["Total"])
+if selected_code is None:
+    st.info(f"No customer in the selected branches matches “{query}”.")
 else:
-    st.info("No weekly data available.")
+    st.subheader(f"📅 Weekly Spend Trend: {selected_customer}")
+    spellings = customer_index.customers.at[selected_code, "Names"]
+    if len(spellings) > 1:
+        st.caption("Also invoiced as: " + ", ".join(name for name in spellings if name != selected_customer))
+    weekly = customer_weekly(selected_branches, selected_code)
+    if not weekly.empty:
+        st.line_chart(weekly)
+    else:
+        st.info("No weekly data available.")
 
 # -------------------- Quarterly Spend Table --------------------
 st.subheader("📆 Quarterly Spend Summary")
-quarterly = filtered_df.groupby(["Top Level Customer Name", "Branch", "Quarter"])["Total"].sum().reset_index()
-pivot = quarterly.pivot_table(index="Quarter", columns="Top Level Customer Name", values="Total")
 
 # -------------------- Drop Alert Logic --------------------
-alerts = []
-for customer in pivot.columns:
-    for i in range(4, len(pivot)):
-        current = pivot.iloc[i][customer]
-        last_year = pivot.iloc[i - 4][customer]
-        if pd.notna(current) and pd.notna(last_year):
-            drop_pct = ((last_year - current) / last_year) * 100
-            if drop_pct > 30:
-                alerts.append({
-                    "Customer": customer,
-                    "Quarter": str(pivot.index[i]),
-                    "Drop %": round(drop_pct, 1),
-                    "Previous Spend": last_year,
-                    "Current Spend": current
-                })
+st.subheader("🚨 Customer Spend Drop Alerts")
+alert_cols = st.columns(2)
+lookback = alert_cols[0].selectbox("Compare each quarter with",
+                                   ["Same quarter last year (YoY)", "Previous quarter (QoQ)", "Rolling average"])
+threshold = alert_cols[1].slider("Alert when spend drops by more than (%)", 5, 90, 30, step=5)
+if lookback == "Rolling average":
+    rolling_quarters = st.slider("Rolling average over (quarters)", 2, 8, 4)
+    alert_df = drop_alerts(selected_branches, threshold, rolling=rolling_quarters)
+else:
+    alert_df = drop_alerts(selected_branches, threshold, lag=LOOKBACKS["QoQ" if "QoQ" in lookback else "YoY"])
 
 # -------------------- Show Alerts --------------------
-st.subheader("🚨 Customers with >30% Spend Drop YoY")
-if alerts:
-    alert_df = pd.DataFrame(alerts).sort_values(by="Drop %", ascending=False)
+st.markdown(f"**Customers with >{threshold}% spend drop: {lookback}**")
+if not alert_df.empty:
     st.dataframe(alert_df.style.format({
         "Drop %": "{:.1f}%",
         "Previous Spend": "₹{:,.0f}",
@@ -81,29 +129,46 @@ if alerts:
     top5 = alert_df.head(5)
     st.table(top5[["Customer", "Quarter", "Drop %"]].style.highlight_max(axis=0, color="salmon"))
 else:
-    st.success("✅ No major drop detected over the last four quarters.")
+    st.success("✅ No major drop detected for the selected comparison.")
 
 # -------------------- Optional Raw Data Toggle --------------------
 with st.expander("📂 Show Raw Data (filtered)"):
-    st.dataframe(filtered_df.head(100))
+    st.dataframe(earliest_invoices(selected_branches))
+    export_button("📥 Download full invoice history (CSV)", invoice_chunks(selected_branches),
+                  "invoices_" + "_".join(selected_branches) + ".csv",
+                  fingerprint=(data_version(selected_branches), tuple(selected_branches)))
 
 # -------------------- Quarter-over-Quarter Growth Analysis --------------------
 st.subheader("📈 Quarter-over-Quarter (QoQ) Growth Rate")
 
-qoq_growth = pivot.pct_change().multiply(100).round(1)
+qoq_growth = qoq_growth_rates(selected_branches)
 
 qoq_view = st.radio("View QoQ Growth for", ["All Customers", "Selected Customer Only"])
-light_cmap = sns.light_palette("green", as_cmap=True)
-
-if qoq_view == "Selected Customer Only":
-    if selected_customer in qoq_growth.columns:
-        qoq_selected = qoq_growth[[selected_customer]]
-        st.dataframe(qoq_selected.style
-                     .format("{:+.1f}%")
-                     .background_gradient(cmap=light_cmap))
+
+with stage("QoQ table", "render"):
+    from matplotlib.colors import LinearSegmentedColormap  # only needed for the QoQ colour map
+
+    light_cmap = LinearSegmentedColormap.from_list("light_green", ["#eef5ee", "green"])
+
+    if qoq_view == "Selected Customer Only":
+        spellings = customer_index.customers.at[selected_code, "Names"] if selected_code is not None else ()
+        columns = [name for name in spellings if name in qoq_growth.columns]
+        if columns:
+            qoq_selected = qoq_growth[columns]
+            st.dataframe(qoq_selected.style
+                         .format("{:+.1f}%")
+                         .background_gradient(cmap=light_cmap))
+        else:
+            st.warning("Selected customer not available in QoQ data.")
     else:
-        st.warning("Selected customer not available in QoQ data.")
-else:
-    st.dataframe(qoq_growth.style
-                 .format("{:+.1f}%")
-                 .background_gradient(cmap="BuGn"))
+        # One row per customer, paged; the colour scale still spans every customer
+        by_customer = qoq_growth.T.rename_axis("Customer").reset_index()
+        by_customer.columns = by_customer.columns.astype(str)
+        quarters = by_customer.columns[1:]
+        finite = qoq_growth.replace([float("inf"), float("-inf")], float("nan")).stack().dropna()
+        vmin, vmax = (finite.min(), finite.max()) if len(finite) else (None, None)
+        paged_table(by_customer, "qoq_growth", style=lambda styler: styler
+                    .format("{:+.1f}%", subset=quarters)
+                    .background_gradient(cmap="BuGn", subset=quarters, vmin=vmin, vmax=vmax))
+
+profiler.finish()
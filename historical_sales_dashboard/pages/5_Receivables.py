@@ -0,0 +1,84 @@
+import streamlit as st
+from utils.loader import branch_names, branch_rejected_rows
+from utils.receivables import load_receivables, AGING_BUCKETS
+from utils.profiling import profile_page, stage
+from utils.tables import paged_table
+from utils.export import export_button
+from utils.result_cache import shared_result
+from utils.refresh import start_refresh_worker
+
+st.set_page_config(layout="wide")
+st.title("💸 Receivables Aging & Overdue Customers")
+profiler = profile_page("Receivables")
+start_refresh_worker()  # rebuilds in the background when data/ changes
+
+
+# Shared across sessions: keyed on the arguments and the invoice data version
+@shared_result
+def aging_table(branches, statuses, by):
+    return load_receivables().aging(branches, statuses, by=by)
+
+
+@shared_result
+def overdue_customers(branches, statuses, min_days, min_amount):
+    return load_receivables().overdue(min_days, min_amount, branches, statuses)
+
+
+# -------------------- Load --------------------
+# Open balances come pre-aggregated from the aging index (utils/receivables.py)
+for name in branch_names():
+    if branch_rejected_rows(name):
+        st.warning(f"⚠️ {branch_rejected_rows(name)} {name} invoices skipped: unreadable Issue Date or Total.")
+
+index = load_receivables()
+as_of = ", ".join(f"{branch} {date:%Y-%m-%d}" for branch, date in sorted(index.as_of.items()))
+st.caption(f"Days overdue are counted from each branch's latest invoice: {as_of}")
+
+# -------------------- Filters --------------------
+filters = st.columns(2)
+branches = sorted(index.as_of)
+selected_branches = filters[0].multiselect("🏢 Select Branches", branches, default=branches)
+selected_statuses = filters[1].multiselect("📨 Invoice Status", index.statuses(),
+                                           default=index.default_statuses())
+
+# -------------------- Aging Summary --------------------
+st.subheader("📊 Outstanding by Age")
+with stage("aging summary", "transform"):
+    by_branch = aging_table(selected_branches, selected_statuses, "Branch")
+totals = by_branch.sum()
+metric_cols = st.columns(len(AGING_BUCKETS) + 1)
+for col, bucket in zip(metric_cols, list(AGING_BUCKETS) + ["Total"]):
+    col.metric(bucket, f"${totals.get(bucket, 0.0):,.0f}")
+
+st.bar_chart(by_branch[list(AGING_BUCKETS)], stack=True)
+
+# -------------------- Aging Breakdown --------------------
+st.subheader("📋 Aging Breakdown")
+group = st.radio("Group by", ["Customer", "Branch", "Status", "Delivery"], horizontal=True)
+with stage("aging breakdown", "transform"):
+    breakdown = aging_table(selected_branches, selected_statuses, group).reset_index()
+
+money = {col: "${:,.0f}" for col in list(AGING_BUCKETS) + ["Total"]}
+with stage("aging table", "render"):
+    paged_table(breakdown, f"aging_{group}", style=lambda styler: styler
+                .format(money)
+                .background_gradient(cmap="Reds", subset=["90+ days"]))
+export_button("📥 Download Aging Report", breakdown, f"receivables_aging_by_{group.lower()}.xlsx",
+              sheet_name="Aging")
+
+# -------------------- Overdue Alerts --------------------
+st.subheader("🚨 Overdue Customers")
+alert_cols = st.columns(2)
+min_days = alert_cols[0].slider("Overdue by more than (days)", 30, 180, 90, step=30)
+min_amount = alert_cols[1].number_input("Owing more than ($)", min_value=0, value=10_000, step=5_000)
+overdue = overdue_customers(selected_branches, selected_statuses, min_days, min_amount)
+
+if not overdue.empty:
+    st.markdown(f"**{len(overdue)} customers owe ${overdue['Overdue'].sum():,.0f} "
+                f"more than {min_days} days past due**")
+    paged_table(overdue, "overdue", style=lambda styler: styler
+                .format({"Overdue": "${:,.0f}", "Oldest": "{:,} days"}))
+else:
+    st.success("✅ No customer is that far overdue.")
+
+profiler.finish()
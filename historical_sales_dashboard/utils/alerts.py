@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+from utils.profiling import stage
+
+# Customer spend-drop alerts over a period x customer pivot (e.g.
+# RollupCube.quarterly_by_customer). Each period is compared with a baseline:
+# the period `lag` rows earlier (1 = QoQ, 4 = YoY on quarters) or, with
+# `rolling`, the mean of the previous N periods. Computed on the whole NumPy
+# matrix at once instead of looping over customers and periods.
+
+LOOKBACKS = {"YoY": 4, "QoQ": 1}
+
+
+@stage("spend_drop_alerts", "transform")
+def spend_drop_alerts(pivot, threshold=30, lag=4, rolling=None, latest_only=False):
+    values = pivot.to_numpy(dtype="float64")
+    if rolling:
+        baseline = pivot.rolling(rolling, min_periods=1).mean().shift(1).to_numpy(dtype="float64")
+    else:
+        baseline = np.full_like(values, np.nan)
+        if lag < len(values):
+            baseline[lag:] = values[:-lag]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drop = (baseline - values) / baseline * 100
+    hit = ~np.isnan(values) & ~np.isnan(baseline) & (drop > threshold)
+    if latest_only:
+        hit[:-1] = False
+
+    rows, cols = np.nonzero(hit)
+    alerts = pd.DataFrame({
+        "Customer": pivot.columns[cols],
+        "Quarter": pivot.index[rows].astype(str),
+        "Drop %": drop[rows, cols].round(1),
+        "Previous Spend": baseline[rows, cols],
+        "Current Spend": values[rows, cols],
+    })
+    return alerts.sort_values(by="Drop %", ascending=False, kind="stable").reset_index(drop=True)
@@ -0,0 +1,91 @@
+import os
+import time
+import argparse
+import multiprocessing
+import pandas as pd
+from utils.rollups import load_rollups
+from utils.forecast_models import MODELS
+
+# Batch forecasting across every branch (and optionally every top-level
+# customer). Vectorized models fit all series in one pass; per-series models
+# fan out over a process pool and are cut off at the time budget: the worker
+# processes are terminated then, fits in progress included, and those series
+# keep only their fast-model forecasts. `skipped` maps each such model to
+# {series: reason} for the series it did not forecast (budget or a failed fit).
+#   python -m utils.batch_forecast --customers --models holt prophet --budget 120
+
+
+def run_batch(matrix, model_names, horizon=12, time_budget=None, workers=None):
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    frames = []
+    skipped = {}
+
+    for name in model_names:
+        model = MODELS[name]()
+        if not model.per_series:
+            frames.append(model.forecast(matrix, horizon))
+            continue
+
+        # Leaving the `with` terminates the pool, so the budget is a hard limit
+        with multiprocessing.Pool(processes=workers) as pool:
+            pending = [pool.apply_async(model.forecast_series, (key, matrix.loc[key], horizon))
+                       for key in matrix.index]
+            for result in pending:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                result.wait(timeout)
+            skipped[name] = {}
+            for key, result in zip(matrix.index, pending):
+                if not result.ready():
+                    skipped[name][key] = "time budget"
+                    continue
+                try:
+                    value = result.get()
+                except Exception as error:
+                    skipped[name][key] = f"{type(error).__name__}: {error}"
+                    continue
+                if value is not None:
+                    frames.append(value)
+
+    table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return table, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Forecast every branch (and customer) in one batch.")
+    parser.add_argument("--customers", action="store_true",
+                        help="forecast each branch x top-level customer series as well")
+    parser.add_argument("--models", nargs="+", default=["linear", "holt"], choices=sorted(MODELS))
+    parser.add_argument("--horizon", type=int, default=12, help="weeks to forecast")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="seconds allowed for per-series models such as prophet")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="forecasts.csv")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rollups = load_rollups()
+    matrix = rollups.weekly_matrix()
+    matrix.index = matrix.index.astype(str)
+    if args.customers:
+        by_customer = rollups.weekly_matrix(by_customer=True)
+        by_customer.index = [f"{branch} / {customer}" for branch, customer in by_customer.index]
+        matrix = pd.concat([matrix, by_customer])
+
+    table, skipped = run_batch(matrix, args.models, args.horizon, args.budget, args.workers)
+    table.to_csv(args.out, index=False)
+
+    print(f"{len(matrix):,} series, {len(table):,} forecast rows -> {args.out} "
+          f"({time.perf_counter() - start:.1f}s)")
+    for name, reasons in skipped.items():
+        timed_out = [key for key, reason in reasons.items() if reason == "time budget"]
+        if timed_out:
+            print(f"{name}: {len(timed_out)} series not finished within the {args.budget}s budget")
+        for key, reason in reasons.items():
+            if reason != "time budget":
+                print(f"{name}: {key} failed ({reason})")
+
+
+if __name__ == "__main__":
+    main()
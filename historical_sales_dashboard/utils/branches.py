@@ -0,0 +1,67 @@
+import os
+import glob
+import json
+import threading
+
+# Branch registry: which invoice exports the dashboard loads. Every *.CSV in
+# the data directory is a branch named after the file (WA.CSV -> "WA"), in
+# name order. A branches.json manifest, if present, replaces discovery:
+#   {"WA": "WA.CSV", "NSW": "exports/nsw_invoices.csv"}
+# (branch -> file relative to the data directory, in display order). The scan
+# is cached on the directory's and manifest's mtimes, so adding or removing a
+# file is picked up on the next call without restarting. Kept free of pandas
+# so the home page can use it.
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+MANIFEST = "branches.json"
+BRANCH_PATTERN = "*.[cC][sS][vV]"
+
+_cache = {}   # data dir -> (directory/manifest mtimes, {branch: file name})
+_cache_lock = threading.Lock()
+
+
+def branch_files(data_dir=None):
+    """{branch: file name relative to the data directory}, in display order."""
+    data_dir = data_dir or DATA_DIR
+    key = (_mtime(data_dir), _mtime(os.path.join(data_dir, MANIFEST)))
+    with _cache_lock:
+        cached = _cache.get(data_dir)
+        if cached is not None and cached[0] == key:
+            return dict(cached[1])
+    files = _read_manifest(data_dir)
+    if files is None:
+        files = {os.path.splitext(os.path.basename(path))[0]: os.path.basename(path)
+                 for path in sorted(glob.glob(os.path.join(glob.escape(data_dir), BRANCH_PATTERN)))}
+    with _cache_lock:
+        _cache[data_dir] = (key, files)
+    return dict(files)
+
+
+def branch_names(data_dir=None):
+    return list(branch_files(data_dir))
+
+
+def branch_path(branch, data_dir=None):
+    data_dir = data_dir or DATA_DIR
+    files = branch_files(data_dir)
+    if branch not in files:
+        raise KeyError(f"Unknown branch {branch!r}; found {', '.join(files) or 'no branch files'} in {data_dir}")
+    return os.path.join(data_dir, files[branch])
+
+
+def _read_manifest(data_dir):
+    try:
+        with open(os.path.join(data_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    if not isinstance(manifest, dict):
+        raise ValueError(f"{MANIFEST} must map branch names to file names")
+    return {str(branch): str(name) for branch, name in manifest.items()}
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
@@ -0,0 +1,77 @@
+import altair as alt
+import pandas as pd
+
+# Declarative Vega-Lite charts (via Altair) for the pages. Each chart is a
+# spec plus the already-aggregated rows it draws; the browser does the
+# rendering, hover tooltips and zoom, so none of that costs a server rerun.
+#   st.altair_chart(time_series(weekly, "ds", {"y": "Weekly Sales"}), width="stretch")
+
+SOLID, DASHED = [1, 0], [6, 4]
+
+
+def time_series(frame, x, series, title="", y_title="Sales", dashed=(), band=None, points=(), height=320):
+    """Lines for the `series` columns ({column: legend label}) against date column `x`.
+
+    `dashed` lists labels drawn dashed, `points` labels drawn as markers only
+    and `band` an optional (low column, high column) shaded range.
+    A small overview under the chart can be dragged across to zoom the main
+    chart to that date range; hovering shows every series for that date.
+    """
+    wide = frame[[x, *series] + ([band[0], band[1]] if band else [])].rename(columns=series)
+    labels = list(series.values())
+    long = wide.melt(id_vars=[x], value_vars=labels, var_name="Series", value_name="Value").dropna(subset=["Value"])
+    long["Style"] = long["Series"].isin(list(dashed)).map({True: "dashed", False: "solid"})
+
+    brush = alt.selection_interval(encodings=["x"])
+    hover = alt.selection_point(fields=[x], nearest=True, on="pointerover", empty=False, clear="pointerout")
+    x_detail = alt.X(f"{x}:T", title=None, scale=alt.Scale(domain=brush))
+    color = alt.Color("Series:N", sort=labels, title=None, legend=alt.Legend(orient="top"))
+
+    lines = alt.Chart(long[~long["Series"].isin(list(points))]).mark_line().encode(
+        x=x_detail, y=alt.Y("Value:Q", title=y_title), color=color,
+        strokeDash=alt.StrokeDash("Style:N", scale=alt.Scale(domain=["solid", "dashed"], range=[SOLID, DASHED]),
+                                  legend=None))
+    layers = [lines]
+    if points:
+        layers.append(alt.Chart(long[long["Series"].isin(list(points))]).mark_circle(size=25).encode(
+            x=x_detail, y="Value:Q", color=color))
+    if band:
+        layers.insert(0, alt.Chart(wide).mark_area(opacity=0.2).encode(
+            x=x_detail, y=alt.Y(f"{band[0]}:Q", title=y_title), y2=f"{band[1]}:Q"))
+
+    tooltip = [alt.Tooltip(f"{x}:T", title="Week")] + [alt.Tooltip(f"{label}:Q", format=",.0f") for label in labels]
+    layers.append(alt.Chart(wide).mark_rule(color="gray").encode(
+        x=x_detail, opacity=alt.condition(hover, alt.value(0.6), alt.value(0)), tooltip=tooltip,
+    ).add_params(hover))
+
+    detail = alt.layer(*layers).properties(title=title, height=height)
+    overview = alt.Chart(long).mark_line(strokeWidth=1).encode(
+        x=alt.X(f"{x}:T", title=None), y=alt.Y("Value:Q", title=None, axis=alt.Axis(labels=False, ticks=False)),
+        color=alt.Color("Series:N", sort=labels, legend=None),
+    ).add_params(brush).properties(height=50)
+    return alt.vconcat(detail, overview).resolve_scale(color="shared")
+
+
+def category_lines(frame, x, y, color, title="", y_title="Sales", height=360):
+    """One line per `color` group over an ordinal `x` (e.g. financial years)."""
+    return alt.Chart(frame.dropna(subset=[y])).mark_line(point=True).encode(
+        x=alt.X(f"{x}:O", title=x),
+        y=alt.Y(f"{y}:Q", title=y_title),
+        color=alt.Color(f"{color}:N", title=None, legend=alt.Legend(orient="top")),
+        tooltip=[color, x, alt.Tooltip(f"{y}:Q", format=",.0f")],
+    ).properties(title=title, height=height).interactive(bind_y=False)
+
+
+def heatmap(pivot, title="", scheme="yellowgreenblue", height=320):
+    """Annotated heatmap of a pivot table (rows on y, columns on x)."""
+    cells = pivot.rename_axis(index="Row", columns="Column").stack().rename("Value").reset_index()
+    base = alt.Chart(cells).encode(
+        x=alt.X("Column:O", title=pivot.columns.name), y=alt.Y("Row:O", title=pivot.index.name))
+    rect = base.mark_rect().encode(
+        color=alt.Color("Value:Q", scale=alt.Scale(scheme=scheme), title=None),
+        tooltip=["Row", "Column", alt.Tooltip("Value:Q", format=",.0f")])
+    midpoint = cells["Value"].min() + (cells["Value"].max() - cells["Value"].min()) / 2 if len(cells) else 0
+    text = base.mark_text(fontSize=11).encode(
+        text=alt.Text("Value:Q", format=",.0f"),
+        color=alt.condition(alt.datum.Value > midpoint, alt.value("white"), alt.value("black")))
+    return (rect + text).properties(title=title, height=height)
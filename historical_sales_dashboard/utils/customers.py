@@ -0,0 +1,215 @@
+import re
+from bisect import bisect_left
+from collections import Counter
+import numpy as np
+import pandas as pd
+from utils.loader import load_branch_data
+from utils.rollups import PerVersion, data_version
+from utils.profiling import stage
+
+# Customer index, built once per data version. A customer is every Top Level
+# Customer ID sharing a normalized name (case, punctuation and "Pty Ltd"
+# ignored), so one company spelled differently - or numbered differently - in
+# different branch exports is one entry, keyed by its smallest ID so the key
+# (and a page's selection) survives a data refresh. For each customer it keeps
+# the row positions of its invoices in every branch frame, and for search a
+# sorted list of normalized names (prefix lookup by bisection), word starts,
+# and a trigram index for fuzzy matches. Searches walk these lazily and stop
+# at `limit`, so a keystroke never scans every invoice or name.
+#   index = load_customer_index()
+#   code = index.search("fulton")[0]
+#   customer_invoices(code, ["WA"], ["Issue Date", "Total"])
+
+INDEX_COLUMNS = ["Top Level Customer ID", "Top Level Customer Name"]
+LEGAL_WORDS = {"pty", "ltd", "limited", "proprietary", "inc", "co"}
+FUZZY_MIN_SCORE = 0.5   # share of the query's trigrams a fuzzy match must contain
+CONSISTENT_READS = 3    # index/frame reloads before customer_invoices indexes its own load
+
+
+def normalize_name(name):
+    words = re.sub(r"[^0-9a-z]+", " ", str(name).casefold()).split()
+    return " ".join(word for word in words if word not in LEGAL_WORDS) or " ".join(words)
+
+
+class CustomerIndex:
+    def __init__(self, version, dataset):
+        self.version = version
+        counts, positions = [], {}
+        for branch, frame in dataset.items():
+            ids = frame["Top Level Customer ID"]
+            pairs = frame.groupby([ids, frame["Top Level Customer Name"].astype(str)], observed=True).size()
+            counts.append(pairs.rename("Invoices").reset_index().assign(Branch=branch))
+            positions[branch] = frame.groupby(ids, sort=False).indices   # ID -> row positions
+        self.lengths = {branch: len(frame) for branch, frame in dataset.items()}
+        names = (pd.concat(counts, ignore_index=True) if counts
+                 else pd.DataFrame(columns=[*INDEX_COLUMNS, "Invoices", "Branch"]))
+        names.columns = ["ID", "Name", "Invoices", "Branch"]
+        names["Key"] = names["Name"].map(normalize_name)
+
+        # IDs that share a normalized name, and names that share an ID, are one customer
+        names["Customer"] = _components(names["ID"].to_numpy(), names["Key"].to_numpy())
+        self.customers = pd.DataFrame({
+            # The spelling used on most invoices is the display name
+            "Name": names.groupby(["Customer", "Name"])["Invoices"].sum()
+                         .sort_values(ascending=False, kind="stable").reset_index()
+                         .drop_duplicates("Customer").set_index("Customer")["Name"],
+            "Names": names.groupby("Customer")["Name"].agg(lambda s: tuple(sorted(set(s)))),
+            "IDs": names.groupby("Customer")["ID"].agg(lambda s: tuple(sorted(set(s)))),
+            "Branches": names.groupby("Customer")["Branch"].agg(lambda s: tuple(dict.fromkeys(s))),
+            "Invoices": names.groupby("Customer")["Invoices"].sum(),
+        }).sort_index()
+        self.customers.index.name = "Customer"
+
+        self._positions = positions
+        self._by_invoices = list(self.customers.sort_values("Invoices", ascending=False, kind="stable").index)
+
+        # Search structures over every spelling: whole names, word starts, trigrams
+        keys = names[["Key", "Customer"]].drop_duplicates()
+        self._names = sorted(zip(keys["Key"], keys["Customer"]))
+        self._words = sorted((key[space + 1:], code) for key, code in self._names
+                             for space in _spaces(key))
+        self._trigrams = {}
+        self._grams = {}
+        for key, code in self._names:
+            grams = _trigrams(key)
+            self._grams[code] = self._grams.get(code, set()) | grams
+            for gram in grams:
+                self._trigrams.setdefault(gram, []).append(code)
+
+    # Search: whole-name prefixes, then word prefixes, then fuzzy (trigram) matches
+    def matches(self, query, branches=None):
+        """Customer codes matching `query`, best kinds of match first, lazily."""
+        query = normalize_name(query)
+        allowed = set(branches) if branches is not None else None
+        seen = set()
+
+        def fresh(codes):
+            for code in codes:
+                if code in seen:
+                    continue
+                seen.add(code)
+                if allowed is None or allowed.intersection(self.customers.at[code, "Branches"]):
+                    yield code
+
+        if not query:
+            yield from fresh(self._by_invoices)
+            return
+        yield from fresh(_prefixed(self._names, query))
+        yield from fresh(_prefixed(self._words, query))
+        yield from fresh(self._fuzzy(query))
+
+    def search(self, query, limit=20, branches=None):
+        codes = []
+        for code in self.matches(query, branches):
+            codes.append(code)
+            if len(codes) >= limit:
+                break
+        return codes
+
+    def _fuzzy(self, query):
+        grams = _trigrams(query)
+        shared = Counter(code for gram in grams for code in self._trigrams.get(gram, ()))
+        # Share of the query's trigrams found in the name; ties go to the closer length
+        scored = [(count / len(grams), count / len(grams | self._grams[code]), code)
+                  for code, count in shared.items()]
+        for score, _, code in sorted(scored, key=lambda item: (-item[0], -item[1], item[2])):
+            if score < FUZZY_MIN_SCORE:
+                break
+            yield code
+
+    # Lookups
+    def label(self, code):
+        return self.customers.at[code, "Name"]
+
+    def rows(self, code, branches=None):
+        """{branch: row positions of the customer's invoices in that branch's frame}."""
+        if code not in self.customers.index:   # gone in this data version
+            return {}
+        ids = self.customers.at[code, "IDs"]
+        rows = {}
+        for branch in branches if branches is not None else self._positions:
+            found = [self._positions.get(branch, {}).get(i) for i in ids]
+            found = [positions for positions in found if positions is not None]
+            if found:
+                rows[branch] = np.sort(np.concatenate(found))
+        return rows
+
+    def invoices(self, dataset, code, branches=None, columns=None):
+        """The customer's invoices, taken from `dataset` by row position (same data version)."""
+        rows = self.rows(code, branches if branches is not None else list(dataset))
+        frames = [(dataset[branch] if columns is None else dataset[branch][columns]).iloc[positions]
+                  for branch, positions in rows.items()]
+        if not frames:   # keep the columns (and dtypes) for an empty result
+            frames = [(frame if columns is None else frame[columns]).iloc[:0] for frame in dataset.values()][:1]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+@stage("load_customer_index", "transform")
+def load_customer_index():
+    return _indexes.get()
+
+
+def customer_invoices(code, branches=None, columns=None):
+    """`code`'s invoices, with the index and the frames its row positions
+    point into taken from the same data version."""
+    for _ in range(CONSISTENT_READS):
+        index = load_customer_index()
+        dataset = load_branch_data(branches, columns)
+        # A publish between the two loads changes the version; load both again
+        lengths = all(len(frame) == index.lengths.get(branch) for branch, frame in dataset.items())
+        if lengths and data_version() == index.version:
+            return index.invoices(dataset, code, branches, columns)
+
+    # Publishes keep landing between the loads: index one load of every branch
+    # (so customer keys match the shared index) and take the invoices from it
+    wanted = None if columns is None else list(dict.fromkeys([*INDEX_COLUMNS, *columns]))
+    dataset = load_branch_data(None, wanted)
+    index = CustomerIndex(data_version(), {branch: frame[INDEX_COLUMNS] for branch, frame in dataset.items()})
+    if branches is not None:
+        dataset = {branch: dataset[branch] for branch in branches if branch in dataset}
+    return index.invoices(dataset, code, branches, columns)
+
+
+def build_customer_index(version):
+    return CustomerIndex(version, load_branch_data([branch for branch, _ in version], INDEX_COLUMNS))
+
+
+def _prefixed(entries, query):
+    # entries: sorted (key, code); everything whose key starts with `query`
+    for i in range(bisect_left(entries, (query,)), len(entries)):
+        key, code = entries[i]
+        if not key.startswith(query):
+            return
+        yield code
+
+
+def _spaces(key):
+    return [i for i, char in enumerate(key) if char == " "]
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _components(ids, keys):
+    # Union-find over ID and name-key nodes; returns, per row, the smallest ID
+    # in its component
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for i, key in zip(ids, keys):
+        a, b = find(("id", i)), find(("key", key))
+        if a != b:
+            parent[b] = a
+    roots = pd.Series([str(find(("id", i))) for i in ids])
+    return pd.Series(ids).groupby(roots).transform("min").to_numpy()
+
+
+_indexes = PerVersion(build_customer_index)
@@ -0,0 +1,180 @@
+import os
+import hashlib
+import threading
+import pandas as pd
+import streamlit as st
+from utils.loader import CACHE_DIR, load_branch
+
+# Lazy CSV/XLSX downloads. Nothing is serialized while the page renders: the
+# file is written when the button is clicked, in row chunks (XLSX through
+# xlsxwriter's constant-memory mode), straight to data/.cache/exports. Files
+# are keyed by a fingerprint of their content, so asking for the same export
+# again is served from disk.
+#   export_button("📥 Download CSV", df, "report.csv")
+#   export_button("📥 All invoices", invoice_chunks(branches), "invoices.csv",
+#                 fingerprint=(data_version(branches), tuple(branches)))
+
+EXPORT_DIR = os.path.join(CACHE_DIR, "exports")
+KEEP_EXPORTS = 20
+CHUNK_ROWS = 50_000
+MIME_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def export_button(label, source, file_name, fingerprint=None, index=False, sheet_name="Sheet1", key=None):
+    """Download button whose file is only built on click.
+
+    `source` is a DataFrame or a zero-argument callable returning an iterable of
+    DataFrame chunks (all with the same columns). Callables need a
+    `fingerprint` describing their content (e.g. the data version and filters).
+    """
+    fmt = file_name.rsplit(".", 1)[-1].lower()
+    if fmt not in MIME_TYPES:
+        raise ValueError(f"Unsupported export format: {file_name}")
+
+    def build():
+        if isinstance(source, pd.DataFrame):
+            return export_bytes(fingerprint or frame_fingerprint(source), fmt,
+                                lambda: frame_chunks(source), index, sheet_name)
+        return export_bytes(fingerprint, fmt, source, index, sheet_name)
+
+    return st.download_button(label, build, file_name=file_name, mime=MIME_TYPES[fmt], key=key)
+
+
+def export_bytes(fingerprint, fmt, chunks, index=False, sheet_name="Sheet1"):
+    """Contents of the cached export, writing it from `chunks()` if it isn't on disk yet."""
+    path = _export_path(fingerprint, fmt, index, sheet_name)
+    # Read under the file's lock: pruning takes it before deleting
+    while True:
+        lock = _lock_for(path)
+        with lock:
+            if _locks.get(path) is not lock:
+                continue   # pruned (lock dropped) while we waited; take the new one
+            _write_export(path, fmt, chunks, index, sheet_name)
+            with open(path, "rb") as f:
+                data = f.read()
+        break
+    _prune_exports(keep=path)
+    return data
+
+
+def _export_path(fingerprint, fmt, index, sheet_name):
+    digest = hashlib.sha1(repr((fingerprint, index, sheet_name)).encode()).hexdigest()[:16]
+    return os.path.join(EXPORT_DIR, f"{digest}.{fmt}")
+
+
+def _write_export(path, fmt, chunks, index, sheet_name):
+    # Caller holds the path's lock
+    if os.path.exists(path):
+        os.utime(path)
+        return
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        (write_csv if fmt == "csv" else write_xlsx)(chunks(), tmp, index, sheet_name)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def write_csv(chunks, path, index=False, sheet_name=None):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, index=index, header=i == 0)
+
+
+def write_xlsx(chunks, path, index=False, sheet_name="Sheet1"):
+    import xlsxwriter
+
+    # constant_memory flushes each row to disk as soon as the next one starts
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "nan_inf_to_errors": True,
+                                          "default_date_format": "yyyy-mm-dd"})
+    worksheet = workbook.add_worksheet(sheet_name)
+    bold = workbook.add_format({"bold": True})
+    row = 0
+    for chunk in chunks:
+        if index:
+            chunk = chunk.reset_index()
+        if row == 0:
+            worksheet.write_row(0, 0, [str(col) for col in chunk.columns], bold)
+            row = 1
+        for values in _cell_values(chunk):
+            worksheet.write_row(row, 0, values)
+            row += 1
+    workbook.close()
+
+
+def frame_chunks(frame, rows=CHUNK_ROWS):
+    # Row slices are views of `frame`, not copies
+    for start in range(0, max(len(frame), 1), rows):
+        yield frame.iloc[start:start + rows]
+
+
+def invoice_chunks(branches, columns=None, rows=CHUNK_ROWS):
+    """Callable for export_button: every invoice of `branches`, one branch at a time.
+
+    The frames are taken now, while the page renders, so the file written on
+    click holds the data version its fingerprint was computed for.
+    """
+    frames = [load_branch(branch, columns) for branch in branches]
+
+    def chunks():
+        for frame in frames:
+            yield from frame_chunks(frame, rows)
+    return chunks
+
+
+def frame_fingerprint(frame):
+    hashed = pd.util.hash_pandas_object(frame, index=True).to_numpy()
+    return (tuple(map(str, frame.columns)), hashlib.sha1(hashed.tobytes()).hexdigest())
+
+
+def _cell_values(chunk):
+    # xlsxwriter writes None as a blank cell; Periods etc. go out as text
+    cells = chunk.astype(object)
+    for col in cells.columns:
+        if isinstance(chunk[col].dtype, pd.PeriodDtype):
+            cells[col] = chunk[col].astype(str)
+    return cells.where(chunk.notna(), None).to_numpy().tolist()
+
+
+def _lock_for(path):
+    with _locks_lock:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def _prune_exports(keep=None):
+    # Oldest first, never `keep` (the export being returned), and never a file
+    # another thread is writing or reading (its lock is held)
+    files = []
+    try:
+        names = os.listdir(EXPORT_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(EXPORT_DIR, name)
+        if name.endswith(".tmp") or path == keep:
+            continue
+        try:
+            files.append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+    for _, old in sorted(files)[:max(len(files) - (KEEP_EXPORTS - 1), 0)]:
+        lock = _lock_for(old)
+        if not lock.acquire(blocking=False):
+            continue
+        try:
+            os.remove(old)
+            with _locks_lock:   # the file is gone; so is its lock
+                if _locks.get(old) is lock:
+                    del _locks[old]
+        except OSError:
+            pass
+        finally:
+            lock.release()
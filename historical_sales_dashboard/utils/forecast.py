@@ -0,0 +1,164 @@
+import os
+import glob
+import json
+import hashlib
+import threading
+from io import StringIO
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from utils.loader import CACHE_DIR
+from utils.profiling import stage
+
+# Fitted Prophet models keyed by (branch, weekly-series fingerprint, horizon).
+# Fits are persisted under data/.cache/forecasts so restarts don't retrain.
+# When the data changes, the refit runs on a background thread while callers
+# keep getting the last good forecast for that branch (marked stale).
+
+FORECAST_DIR = os.path.join(CACHE_DIR, "forecasts")
+FIT_LAYOUT = 2   # bumped when the stored forecast changes shape (2: Monday weeks)
+
+Forecast = namedtuple("Forecast", ["model", "frame", "stale"])
+
+_fitted = {}    # key -> (model, forecast frame); only the newest per branch/horizon
+_latest = {}    # (branch, horizon) -> key of the newest fit
+_pending = {}   # key -> Future
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="forecast")
+
+
+def series_fingerprint(weekly):
+    hashed = pd.util.hash_pandas_object(weekly[["ds", "y"]], index=False).values
+    return hashlib.sha1(hashed.tobytes()).hexdigest()[:16]
+
+
+# weekly: DataFrame with Prophet's ds/y columns
+@stage("get_forecast", "model")
+def get_forecast(branch, weekly, horizon=12, wait=False):
+    key = (branch, series_fingerprint(weekly), horizon)
+    with _lock:
+        if key in _fitted:
+            return Forecast(*_fitted[key], stale=False)
+
+    fitted = _read_fit(key)
+    if fitted is not None:
+        with _lock:
+            _remember(key, fitted)
+        return Forecast(*fitted, stale=False)
+
+    future = _submit(key, weekly)
+    previous = _last_good(branch, horizon)
+    if previous is not None and not wait:
+        return Forecast(*previous, stale=True)
+
+    # Nothing to fall back on yet - the first fit has to be waited for
+    return Forecast(*future.result(), stale=False)
+
+
+@stage("train_forecast", "model")
+def train_forecast(weekly, horizon):
+    from prophet import Prophet
+
+    model = Prophet()
+    model.fit(weekly[["ds", "y"]])
+    # Monday weeks, like the history (RollupCube) and the vectorized models
+    future = model.make_future_dataframe(periods=horizon, freq="W-MON")
+    return model, model.predict(future)
+
+
+def _submit(key, weekly):
+    with _lock:
+        future = _pending.get(key)
+        if future is None:
+            future = _executor.submit(_train_and_store, key, weekly.copy())
+            _pending[key] = future
+        return future
+
+
+def _train_and_store(key, weekly):
+    try:
+        fitted = train_forecast(weekly, key[2])
+        _write_fit(key, fitted)
+        with _lock:
+            _remember(key, fitted)
+        return fitted
+    finally:
+        with _lock:
+            _pending.pop(key, None)
+
+
+def _remember(key, fitted):
+    # One fit per branch/horizon: the newer fit replaces the one it supersedes,
+    # so refreshes don't pile up models in memory
+    previous = _latest.get((key[0], key[2]))
+    if previous is not None and previous != key:
+        _fitted.pop(previous, None)
+    _fitted[key] = fitted
+    _latest[(key[0], key[2])] = key
+
+
+def _last_good(branch, horizon):
+    with _lock:
+        key = _latest.get((branch, horizon))
+        if key is not None:
+            return _fitted[key]
+
+    # After a restart, fall back to the newest fit persisted for this branch
+    paths = glob.glob(os.path.join(FORECAST_DIR, f"{glob.escape(branch)}-*-{horizon}.json"))
+    for path in sorted(paths, key=os.path.getmtime, reverse=True):
+        fingerprint = os.path.basename(path).rsplit("-", 2)[1]
+        fitted = _read_fit((branch, fingerprint, horizon))
+        if fitted is not None:
+            return fitted
+    return None
+
+
+# Disk persistence
+def _fit_path(key):
+    branch, fingerprint, horizon = key
+    return os.path.join(FORECAST_DIR, f"{branch}-{fingerprint}-{horizon}.json")
+
+
+def _read_fit(key):
+    path = _fit_path(key)
+    if not os.path.exists(path):
+        return None
+    from prophet.serialize import model_from_json
+
+    try:
+        with open(path) as f:
+            stored = json.load(f)
+        if stored.get("layout") != FIT_LAYOUT:
+            return None
+        model = model_from_json(stored["model"])
+        forecast = pd.read_json(StringIO(stored["forecast"]), orient="split")
+        forecast["ds"] = pd.to_datetime(forecast["ds"])
+    except (OSError, ValueError, KeyError):
+        return None  # partial or incompatible file; it gets refitted
+    return model, forecast
+
+
+def _write_fit(key, fitted):
+    from prophet.serialize import model_to_json
+
+    model, forecast = fitted
+    path = _fit_path(key)
+    stored = {"layout": FIT_LAYOUT, "model": model_to_json(model),
+              "forecast": forecast.to_json(orient="split", date_format="iso")}
+    try:
+        os.makedirs(FORECAST_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(stored, f)
+        os.replace(tmp, path)
+    except OSError:
+        return  # read-only deploys keep the fit in memory only
+
+    # Older fits for this branch/horizon are superseded once the new one is on disk
+    branch, _, horizon = key
+    for stale in glob.glob(os.path.join(FORECAST_DIR, f"{glob.escape(branch)}-*-{horizon}.json")):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
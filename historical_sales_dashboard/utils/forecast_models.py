@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+# Pluggable forecast models. Every model takes a series x week matrix (NaN
+# outside each series' own span, see RollupCube.weekly_matrix) and returns a
+# long frame of Series / Week / Forecast / Low Estimate / High Estimate rows.
+# Vectorized models fit every series in one NumPy pass; per-series models
+# (Prophet) set per_series = True and are fanned out by utils.batch_forecast.
+
+
+class LinearTrendModel:
+    name = "linear"
+    per_series = False
+
+    # Ordinary least squares y = a + b*t per row, with the NaN cells masked out
+    def forecast(self, matrix, horizon):
+        values = matrix.to_numpy(dtype="float64")
+        mask = ~np.isnan(values)
+        y = np.where(mask, values, 0.0)
+        t = np.broadcast_to(np.arange(values.shape[1], dtype="float64"), values.shape) * mask
+
+        n = mask.sum(axis=1)
+        sum_t, sum_y = t.sum(axis=1), y.sum(axis=1)
+        sum_tt, sum_ty = (t * t).sum(axis=1), (t * y).sum(axis=1)
+        denom = n * sum_tt - sum_t ** 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(denom > 0, (n * sum_ty - sum_t * sum_y) / denom, 0.0)
+            intercept = np.where(n > 0, (sum_y - slope * sum_t) / n, np.nan)
+            resid = np.where(mask, values - (intercept[:, None] + slope[:, None] * t), 0.0)
+            sigma = np.sqrt((resid ** 2).sum(axis=1) / np.maximum(n - 2, 1))
+
+        # Forecast from each series' own last observed week
+        last = values.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+        steps = last[:, None] + np.arange(1, horizon + 1)
+        point = intercept[:, None] + slope[:, None] * steps
+        return _to_long(matrix, last, point, 1.96 * sigma[:, None], self.name)
+
+
+class HoltModel:
+    name = "holt"
+    per_series = False
+
+    def __init__(self, alpha=0.5, beta=0.1):
+        self.alpha = alpha
+        self.beta = beta
+
+    # Holt's additive-trend exponential smoothing, stepping through the weeks
+    # once and updating every series' level/trend as a vector
+    def forecast(self, matrix, horizon):
+        values = matrix.to_numpy(dtype="float64")
+        rows, weeks = values.shape
+        level = np.full(rows, np.nan)
+        trend = np.zeros(rows)
+        sq_error = np.zeros(rows)
+        seen = np.zeros(rows)
+        alpha, beta = self.alpha, self.beta
+
+        for t in range(weeks):
+            y = values[:, t]
+            observed = ~np.isnan(y)
+            start = observed & np.isnan(level)
+            level[start] = y[start]
+
+            update = observed & ~start
+            predicted = level[update] + trend[update]
+            error = y[update] - predicted
+            sq_error[update] += error ** 2
+            seen[update] += 1
+            new_level = alpha * y[update] + (1 - alpha) * predicted
+            trend[update] = beta * (new_level - level[update]) + (1 - beta) * trend[update]
+            level[update] = new_level
+
+        mask = ~np.isnan(values)
+        last = weeks - 1 - np.argmax(mask[:, ::-1], axis=1)
+        point = level[:, None] + trend[:, None] * np.arange(1, horizon + 1)
+        sigma = np.sqrt(sq_error / np.maximum(seen, 1))
+        spread = 1.96 * sigma[:, None] * np.sqrt(np.arange(1, horizon + 1))
+        return _to_long(matrix, last, point, spread, self.name)
+
+
+class ProphetModel:
+    name = "prophet"
+    per_series = True
+
+    def forecast_series(self, key, series, horizon):
+        from utils.forecast import train_forecast
+
+        weekly = series.dropna().rename_axis("ds").reset_index(name="y")
+        if len(weekly) < 2:
+            return None
+        _, frame = train_forecast(weekly, horizon)
+        frame = frame.tail(horizon)
+        return pd.DataFrame({
+            "Series": [key] * len(frame),
+            "Model": self.name,
+            "Week": frame["ds"].to_numpy(),
+            "Forecast": frame["yhat"].to_numpy(),
+            "Low Estimate": frame["yhat_lower"].to_numpy(),
+            "High Estimate": frame["yhat_upper"].to_numpy(),
+        })
+
+
+MODELS = {model.name: model for model in (LinearTrendModel, HoltModel, ProphetModel)}
+
+
+def _to_long(matrix, last, point, spread, name):
+    horizon = point.shape[1]
+    valid = ~np.isnan(point[:, 0])
+    last_weeks = matrix.columns[last[valid]].to_numpy()
+    weeks = last_weeks[:, None] + np.arange(1, horizon + 1) * np.timedelta64(7, "D")
+    keys = list(matrix.index[valid])
+    return pd.DataFrame({
+        "Series": np.repeat(np.array(keys, dtype=object), horizon),
+        "Model": name,
+        "Week": weeks.ravel(),
+        "Forecast": point[valid].ravel(),
+        "Low Estimate": (point - spread)[valid].ravel(),
+        "High Estimate": (point + spread)[valid].ravel(),
+    })
@@ -0,0 +1,106 @@
+import os
+import csv
+import argparse
+from utils import loader
+from utils.branches import branch_path
+from utils.rollups import load_rollups
+from utils.kpis import refresh_kpis
+
+# Incremental ingestion of a daily invoice export. Only invoices that are new,
+# or whose fields changed (Status, Outstanding, ...), are appended to the
+# branch CSV; the loader treats the file as an upsert log keyed on Invoice ID
+# (later rows win), parses just the appended bytes and the rollup cube
+# patches only the weeks/quarters those invoices touch.
+#   python -m utils.ingest WA exports/WA_2025-03-10.CSV
+
+
+def ingest_invoices(branch, delta_path):
+    path = branch_path(branch, loader.DATA_DIR)
+    header, rows = _read_raw(delta_path)
+    base_header, _ = _read_raw(path, header_only=True)
+    if [col.strip() for col in header] != [col.strip() for col in base_header]:
+        raise ValueError(f"{delta_path} columns don't match {os.path.basename(path)}")
+
+    current = loader.load_branch(branch)
+    updates, rejected = loader.read_invoices(delta_path, branch)
+    # Rows without an Invoice ID can't be upserted; count them as rejected
+    blank = updates["Invoice ID"].isna()
+    rejected += int(blank.sum())
+    updates = updates[~blank]
+    new_ids, changed_ids = _new_or_changed(current, updates)
+
+    # Match raw rows on the parsed ID (a blank elsewhere makes the column float)
+    id_col = [col.strip() for col in header].index("Invoice ID")
+    wanted = {int(invoice) for invoice in new_ids | changed_ids}
+    keep = [row for row in rows if _invoice_id(row[id_col]) in wanted]
+    if keep:
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            if not _ends_with_newline(path):
+                f.write("\n")
+            csv.writer(f, quoting=csv.QUOTE_ALL, lineterminator="\n").writerows(keep)
+
+    # Refresh this process's cached frame and rollups from the appended tail,
+    # and the home page KPI snapshot
+    loader.load_branch(branch)
+    load_rollups()
+    refresh_kpis()
+    return {
+        "new": len(new_ids),
+        "updated": len(changed_ids),
+        "unchanged": len(updates) - len(new_ids) - len(changed_ids),
+        "rejected": rejected,
+    }
+
+
+def _new_or_changed(current, updates):
+    existing = current.set_index("Invoice ID")
+    known = updates["Invoice ID"].isin(existing.index)
+    columns = [col for col in updates.columns if col != "Invoice ID" and col in existing.columns]
+
+    before = _as_text(existing.loc[updates.loc[known, "Invoice ID"], columns])
+    after = _as_text(updates.loc[known, columns])
+    changed = (before != after).any(axis=1)
+    return set(updates.loc[~known, "Invoice ID"]), set(updates.loc[known, "Invoice ID"][changed])
+
+
+def _invoice_id(text):
+    # Same reading as loader.read_invoices: thousands separators dropped, numeric
+    try:
+        value = float(text.replace(",", "").strip())
+    except ValueError:
+        return None
+    return int(value) if value.is_integer() else None
+
+
+def _as_text(frame):
+    return frame.astype(object).fillna("").astype(str).to_numpy()
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) in (b"\n", b"\r")
+
+
+def _read_raw(path, header_only=False):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        return header, ([] if header_only else [row for row in reader if row])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append new or changed invoices to a branch dataset.")
+    parser.add_argument("branch", choices=loader.branch_names())
+    parser.add_argument("export", help="CSV export with the same columns as the branch file")
+    args = parser.parse_args(argv)
+
+    summary = ingest_invoices(args.branch, args.export)
+    print(f"{args.branch}: {summary['new']} new, {summary['updated']} updated, "
+          f"{summary['unchanged']} unchanged, {summary['rejected']} rejected")
+
+
+if __name__ == "__main__":
+    main()
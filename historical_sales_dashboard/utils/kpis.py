@@ -0,0 +1,157 @@
+import os
+import json
+import threading
+from utils.branches import branch_files
+
+# Home page KPI snapshot: a few hundred bytes of JSON in data/.cache, derived
+# from the branch CSVs. The landing page only stats the source files and reads
+# this file; when a source changed it keeps showing the previous snapshot and
+# rebuilds in the background. pandas/loader are imported only for the rebuild.
+#   python -m utils.kpis    (also run by warm_cache and ingest)
+
+# Same locations as utils.loader, repeated so the home page never imports it
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+KPI_FILE = os.path.join(DATA_DIR, ".cache", "kpis.json")
+WOW_ALERT_DROP = 5.0   # % week-over-week drop that raises a home page alert
+OVERDUE_ALERT_SHARE = 0.25   # share of a branch's receivables 90+ days overdue that raises one
+KPI_LAYOUT = 2   # bumped when a figure's definition changes, so older snapshots are rebuilt
+
+_refresh_lock = threading.Lock()
+_refreshing = None
+
+
+def kpi_snapshot():
+    """(snapshot dict or None, stale flag). Never aggregates unless no snapshot exists yet."""
+    snapshot = read_kpis()
+    if snapshot is not None and snapshot.get("layout") != KPI_LAYOUT:
+        snapshot = None
+    if snapshot is not None and snapshot.get("sources") == source_signatures():
+        return snapshot, False
+    if snapshot is None:
+        return refresh_kpis(), False
+    _refresh_in_background()
+    return snapshot, True
+
+
+def source_signatures():
+    signatures = {}
+    for branch, filename in branch_files(DATA_DIR).items():
+        try:
+            stat = os.stat(os.path.join(DATA_DIR, filename))
+        except OSError:
+            continue
+        signatures[branch] = [stat.st_mtime_ns, stat.st_size]
+    return signatures
+
+
+def read_kpis():
+    try:
+        with open(KPI_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def refresh_kpis():
+    sources = source_signatures()
+    snapshot = build_kpis()
+    snapshot["sources"] = sources
+    snapshot["layout"] = KPI_LAYOUT
+    try:
+        os.makedirs(os.path.dirname(KPI_FILE), exist_ok=True)
+        tmp = f"{KPI_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, KPI_FILE)
+    except OSError:
+        pass  # read-only deploys rebuild in memory each time
+    return snapshot
+
+
+def build_kpis():
+    import pandas as pd
+    from utils.loader import load_branch_data
+    from utils.receivables import load_receivables
+
+    columns = ["Branch", "Top Level Customer Name", "Issue Date", "Total"]
+    invoices = load_branch_data(list(source_signatures()), columns).concat()
+    invoices["Branch"] = invoices["Branch"].astype(str)
+    invoices["Top Level Customer Name"] = invoices["Top Level Customer Name"].astype(str)
+    issue = invoices["Issue Date"]
+    as_of = issue.max()
+
+    # "Latest" means the last complete month/quarter/week of the data, not of today
+    month = issue.dt.to_period("M")
+    last_month = as_of.to_period("M") - 1
+    monthly = invoices.groupby(month)["Total"].sum()
+
+    quarter = issue.dt.to_period("Q")
+    current_q = as_of.to_period("Q")
+    last_q = current_q - 1
+    active = invoices.groupby(quarter)["Top Level Customer Name"].agg(set)
+
+    def retention(q):
+        before, after = active.get(q - 1, set()), active.get(q, set())
+        return len(before & after) / len(before) * 100 if before else None
+
+    week = issue.dt.normalize() - pd.to_timedelta(issue.dt.dayofweek, unit="D")
+    weekly = invoices.groupby(["Branch", week])["Total"].sum()
+    quarterly = invoices.groupby(["Branch", quarter])["Total"].sum()
+
+    # Branch exports end on different days, so progress and week-over-week
+    # changes are measured against each branch's own latest invoice
+    branches, alerts = [], []
+    for branch, branch_as_of in issue.groupby(invoices["Branch"]).max().sort_index().items():
+        branch_q = branch_as_of.to_period("Q")
+        to_date, previous = quarterly.get((branch, branch_q), 0.0), quarterly.get((branch, branch_q - 1), 0.0)
+        branches.append({"branch": branch, "quarter": str(branch_q), "to_date": float(to_date),
+                         "previous": float(previous), "progress": min(to_date / previous, 1.0) if previous else 0.0})
+        last_week = branch_as_of.normalize() - pd.Timedelta(days=branch_as_of.dayofweek + 7)
+        this_week = weekly.get((branch, last_week), 0.0)
+        prior_week = weekly.get((branch, last_week - pd.Timedelta(weeks=1)), 0.0)
+        change = _change(this_week, prior_week)
+        if change is not None and change <= -WOW_ALERT_DROP:
+            alerts.append({"branch": branch, "week": str(last_week.date()), "change_pct": change})
+
+    receivables = []
+    # Same statuses as the Receivables page shows by default (no drafts)
+    index = load_receivables()
+    aging = index.aging(statuses=index.default_statuses(), by="Branch")
+    for branch, row in aging.sort_index().iterrows():
+        share = row["90+ days"] / row["Total"] if row["Total"] else 0.0
+        receivables.append({"branch": branch, "outstanding": float(row["Total"]), "overdue_90": float(row["90+ days"]),
+                            "alert": bool(share >= OVERDUE_ALERT_SHARE)})
+
+    customers, previous_customers = len(active.get(last_q, ())), len(active.get(last_q - 1, ()))
+    rate, previous_rate = retention(last_q), retention(last_q - 1)
+    return {
+        "as_of": str(as_of.date()),
+        "revenue": {"month": str(last_month), "value": float(monthly.get(last_month, 0.0)),
+                    "change_pct": _change(monthly.get(last_month, 0.0), monthly.get(last_month - 1, 0.0))},
+        "customers": {"quarter": str(last_q), "active": customers,
+                      "change_pct": _change(customers, previous_customers)},
+        "retention": {"quarter": str(last_q), "rate": rate,
+                      "change_pts": rate - previous_rate if rate is not None and previous_rate is not None else None},
+        "quarter_revenue": {"quarter": str(last_q), "value": float(quarterly.xs(last_q, level=1).sum())
+                            if last_q in quarterly.index.get_level_values(1) else 0.0},
+        "branches": branches,
+        "alerts": alerts,
+        "receivables": receivables,
+    }
+
+
+def _change(current, previous):
+    return float((current - previous) / previous * 100) if previous else None
+
+
+def _refresh_in_background():
+    global _refreshing
+    with _refresh_lock:
+        if _refreshing is not None and _refreshing.is_alive():
+            return
+        _refreshing = threading.Thread(target=refresh_kpis, name="kpi-refresh", daemon=True)
+        _refreshing.start()
+
+
+if __name__ == "__main__":
+    print(json.dumps(refresh_kpis(), indent=2))
@@ -0,0 +1,52 @@
+import pandas as pd
+
+# Lifecycle Comparison data: every yearly sheet of HISTORICAL_REPORT.xlsx as
+# one long (Sheet, Branch, Year, Sales) table, read once by
+# loader.load_historical_report. Each sheet's Year x Branch pivot, YoY % change
+# and sales totals are computed here once per workbook version, so changing the
+# sheet or the branch selection only selects columns - the workbook is never
+# reopened and nothing is re-melted or re-pivoted.
+#   report = load_historical_report()
+#   report.pivot("WA", report.branches("WA")[:5])
+
+
+class HistoricalReport:
+    def __init__(self, sales, sheets):
+        self.sales = sales
+        self.sheets = list(sheets)   # every sheet in workbook order, including ones without yearly data
+        self._rows, self._branches, self._pivots, self._yoy, self._totals = {}, {}, {}, {}, {}
+        for sheet, rows in sales.groupby("Sheet", observed=True, sort=False):
+            sheet = str(sheet)
+            rows = rows.assign(Branch=rows["Branch"].astype(str), Year=rows["Year"].astype(str))
+            branches = list(rows.sort_values("Position", kind="stable")["Branch"].unique())
+            pivot = (rows.groupby(["Year", "Branch"])["Sales"].sum().unstack("Branch")
+                     .sort_index().reindex(columns=branches))
+            pivot.columns.name = "Financial Year"
+            self._rows[sheet] = rows[["Branch", "Year", "Sales"]].reset_index(drop=True)
+            self._branches[sheet] = branches
+            self._pivots[sheet] = pivot
+            self._yoy[sheet] = pivot.pct_change().multiply(100).round(1)
+            self._totals[sheet] = pivot.sum()
+
+    def has_yearly_data(self, sheet):
+        return sheet in self._pivots
+
+    def branches(self, sheet):
+        return list(self._branches.get(sheet, []))
+
+    def long(self, sheet, branches):
+        rows = self._rows[sheet]
+        return rows[rows["Branch"].isin(list(branches))]
+
+    def pivot(self, sheet, branches):
+        """Sales with one row per financial year and one column per branch."""
+        return self._pivots[sheet][list(branches)]
+
+    def yoy_change(self, sheet, branches):
+        return self._yoy[sheet][list(branches)]
+
+    def ranking(self, sheet, branches):
+        totals = self._totals[sheet][list(branches)].sort_values(ascending=False)
+        ranking = pd.DataFrame({"Branch": totals.index, "Total Sales": totals.to_numpy()})
+        ranking["Rank"] = ranking["Total Sales"].rank(ascending=False).astype(int)
+        return ranking
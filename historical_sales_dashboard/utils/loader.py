@@ -1,22 +1,494 @@
 import pandas as pd
 import os
+import glob
+import json
+import shutil
+import hashlib
+import threading
+from io import BytesIO
+from contextlib import contextmanager
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from utils.branches import branch_files
+from utils.profiling import stage
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # snapshots are only an optimisation; parse the sources instead
+    pa = feather = None
 
 # Base data directory (relative path)
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
 
-# 1. For Lifecycle Comparison
+# Columnar (Feather) snapshots of the parsed sources, named by source content hash
+CACHE_DIR = os.path.join(DATA_DIR, '.cache')
+
+# Branch exports are discovered by utils/branches.py (every *.CSV, or a
+# branches.json manifest) and parsed concurrently, one memoized frame each
+LOAD_WORKERS = int(os.environ.get("DASHBOARD_LOAD_WORKERS", min(8, os.cpu_count() or 1)))
+
+# Schema of the branch invoice exports. Dates are written as 25.8.2022 and
+# amounts as "5,621.08", so both get an explicit format instead of inference.
+DATE_FORMAT = "%d.%m.%Y"
+INVOICE_SCHEMA = {
+    "Entity Name": "text",
+    "Branch Region": "text",
+    "Branch": "text",
+    "Division": "text",
+    "Due Date": "date",
+    "Top Level Customer ID": "id",
+    "Top Level Customer Name": "text",
+    "Customer ID": "id",
+    "Customer": "text",
+    "Billing Group ID": "text",
+    "Billing Group": "text",
+    "Invoice ID": "id",
+    "Invoice #": "text",
+    "Issue Date": "date",
+    "Total": "amount",
+    "Outstanding": "amount",
+    "Delivery": "text",
+    "Status": "text",
+}
+REQUIRED_COLUMNS = ["Issue Date", "Total"]
+
+# Compact in-memory layout, shared by every session: repeated text (names,
+# entity, status, the mostly-empty region/division/billing columns) is
+# dictionary-encoded and IDs use the smallest integer type that fits. Invoice
+# # is unique per row so stays plain text; amounts stay float64 to keep cents
+# exact in sums, and dates are already 8-byte datetime64.
+CATEGORY_COLUMNS = [col for col, kind in INVOICE_SCHEMA.items() if kind == "text" and col != "Invoice #"]
+ID_COLUMNS = [col for col, kind in INVOICE_SCHEMA.items() if kind == "id"]
+
+# Bumped whenever the parsed frame's dtypes change, so older snapshots are reparsed
+SNAPSHOT_LAYOUT = 2
+
+HISTORICAL_FILE = "HISTORICAL_REPORT.xlsx"
+# Row-label column and year-column marker ("18/19") of the yearly report sheets
+HISTORICAL_LABEL = "Financial Year"
+HISTORICAL_LAYOUT = 1
+
+# Parsed sources, keyed by path -> (stat signature, content hash, payload).
+# Each path has its own lock, so different files parse at the same time.
+_memo = {}
+_memo_lock = threading.Lock()
+_path_locks = {}
+
+# Background refresh (utils/refresh.py): sources are re-parsed into a private
+# copy of the memo on the refresh threads and published with one assignment.
+# Once pinned, readers get the published payloads without checking the files,
+# and the published branch list: a new branch file is only picked up (and
+# parsed) by the refresh worker. The list lives in the memo under BRANCHES.
+_staged = threading.local()
+_pinned = False
+BRANCHES = "<branches>"
+
+# Last in-place append per branch: (old hash, new hash, replaced rows, appended rows)
+_branch_changes = {}
+
+
+# 1. For Lifecycle Comparison: every sheet normalized into one HistoricalReport
+@stage("load_historical_report", "loader")
 def load_historical_report():
-    path = os.path.join(DATA_DIR, "HISTORICAL_REPORT.xlsx")
-    return pd.ExcelFile(path)
+    path = os.path.join(DATA_DIR, HISTORICAL_FILE)
+    return _load_cached(path, _build_historical)
+
+
+# 2. For Weekly Trends, Benchmark, Customer Analysis and the aggregations
+class BranchDataset(Mapping):
+    """Invoices partitioned by branch: {branch: frame}, one memoized frame each."""
+
+    def __init__(self, partitions):
+        self.partitions = partitions
+
+    def __getitem__(self, branch):
+        return self.partitions[branch]
+
+    def __iter__(self):
+        return iter(self.partitions)
+
+    def __len__(self):
+        return len(self.partitions)
+
+    def concat(self, branches=None):
+        frames = [self.partitions[branch] for branch in (branches if branches is not None else self.partitions)]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+@stage("load_branch_data", "loader")
+def load_branch_data(branches=None, columns=None):
+    """Every discovered branch (or `branches`), parsed/read concurrently."""
+    branches = list(branches) if branches is not None else branch_names()
+    if len(branches) <= 1 or LOAD_WORKERS <= 1:
+        return BranchDataset({branch: load_branch(branch, columns) for branch in branches})
+    # Worker threads inherit a background refresh's staged memo, if any
+    memo = getattr(_staged, "memo", None)
+
+    def load(branch):
+        if memo is None:
+            return load_branch(branch, columns)
+        with staged_sources(memo):
+            return load_branch(branch, columns)
+
+    with ThreadPoolExecutor(max_workers=min(LOAD_WORKERS, len(branches)), thread_name_prefix="load") as pool:
+        return BranchDataset(dict(zip(branches, pool.map(load, branches))))
+
+
+def branch_names():
+    return list(_branch_paths())
+
+
+def _branch_paths():
+    # {branch: path}: the published list once pinned; a staged refresh
+    # discovers once and keeps that list for the whole pass
+    memo = _active_memo()
+    if BRANCHES in memo and (memo is not _memo or _pinned):
+        return memo[BRANCHES][2]
+    paths = {branch: os.path.join(DATA_DIR, name) for branch, name in branch_files(DATA_DIR).items()}
+    memo[BRANCHES] = (None, None, paths)
+    return paths
+
+
+def _branch_path(branch):
+    paths = _branch_paths()
+    if branch not in paths:
+        raise KeyError(f"Unknown branch {branch!r}; loaded branches: {', '.join(paths) or 'none'}")
+    return paths[branch]
+
+
+def load_branch(branch, columns=None):
+    # Pages get a shallow copy (or just the `columns` they read): adding or
+    # replacing columns on it never touches the memoized frame, and with
+    # copy-on-write no invoice data is duplicated per session.
+    df = _cached_branch(branch)[0]
+    return df[columns] if columns is not None else df.copy(deep=False)
+
+
+def branch_data_version(branch):
+    path = _branch_path(branch)
+    _cached_branch(branch)
+    return _active_memo()[path][1]
+
+
+def branch_versions(branches=None):
+    """((branch, content hash), ...) for every branch; a cold start parses the
+    missing branches concurrently first."""
+    branches = list(branches) if branches is not None else branch_names()
+    memo = _active_memo()
+    missing = [branch for branch in branches if _branch_path(branch) not in memo]
+    if len(missing) > 1:
+        load_branch_data(missing)
+    return tuple((branch, branch_data_version(branch)) for branch in branches)
+
+
+def branch_rejected_rows(branch):
+    return _cached_branch(branch)[1]
+
+
+def branch_changes(branch, since_version):
+    # Rows replaced/appended between since_version and the current version, if
+    # the branch only grew by an append; None means "rebuild from scratch"
+    change = _branch_changes.get(branch)
+    if change is None or change[0] != since_version or change[1] != branch_data_version(branch):
+        return None
+    return change[2], change[3]
+
+
+def _cached_branch(branch):
+    path = _branch_path(branch)
+    return _load_cached(path, lambda path, digest: _build_branch(path, digest, branch),
+                        lambda path, digest, cached, tail: _extend_branch(path, digest, cached, tail, branch))
+
+
+def _load_cached(path, build, extend=None):
+    memo = _active_memo()
+    if _pinned and memo is _memo and path in memo:
+        return memo[path][2]
+
+    signature = _file_signature(path)
+    with _path_lock(path):
+        cached = memo.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[2]
+
+        # mtime moved (e.g. file re-copied) - only rebuild if the bytes changed
+        old_size = cached[0][1] if cached is not None else 0
+        prefix_digest, digest = _file_hash(path, prefix=old_size)
+        if cached is not None and cached[1] == digest:
+            memo[path] = (signature, digest, cached[2])
+            return cached[2]
+
+        # The old bytes are untouched and rows were appended: parse only the tail
+        if extend is not None and cached is not None and prefix_digest == cached[1]:
+            tail = _read_tail(path, old_size)
+            if tail is not None:
+                payload = extend(path, digest, cached, tail)
+                memo[path] = (signature, digest, payload)
+                return payload
+
+        payload = build(path, digest)
+        memo[path] = (signature, digest, payload)
+        return payload
+
+
+def _path_lock(path):
+    with _memo_lock:
+        return _path_locks.setdefault(path, threading.Lock())
+
+
+def _active_memo():
+    memo = getattr(_staged, "memo", None)
+    return _memo if memo is None else memo
+
+
+@contextmanager
+def staged_sources(memo=None):
+    """Parse sources on this thread into `memo` (default: a copy of the published
+    memo) instead of the memo pages read; yields it for publish_sources."""
+    if memo is None:
+        memo = dict(_memo)
+        memo.pop(BRANCHES, None)   # rediscover the branch files for this pass
+    _staged.memo = memo
+    try:
+        yield _staged.memo
+    finally:
+        del _staged.memo
+
+
+def is_staging():
+    return getattr(_staged, "memo", None) is not None
+
+
+def publish_sources(memo=None):
+    """Make `memo` (a staged copy) what pages read, and stop re-checking the
+    files on every read - from now on only the refresh worker does that."""
+    global _memo, _pinned
+    memo = _memo if memo is None else memo
+    # Only branches parsed into this memo are published
+    paths = memo.get(BRANCHES, (None, None, {}))[2]
+    memo[BRANCHES] = (None, None, {branch: path for branch, path in paths.items() if path in memo})
+    _memo = memo
+    _pinned = True
+
+
+def _build_branch(path, digest, branch):
+    snapshot = snapshot_path(path, digest) + ".feather"
+    df, meta = read_snapshot(snapshot)
+    if df is not None and meta.get("layout") == SNAPSHOT_LAYOUT:
+        return df, meta.get("rejected_rows", 0)
+
+    df, rejected = read_invoices(path, branch)
+    write_snapshot(snapshot, df, {"rejected_rows": rejected, "layout": SNAPSHOT_LAYOUT})
+    return df, rejected
+
+
+def _extend_branch(path, digest, cached, tail, branch):
+    df, rejected = cached[2]
+    appended, tail_rejected = read_invoices(BytesIO(tail), branch, names=list(df.columns))
+    df, replaced = upsert_invoices(df, appended)
+    _branch_changes[branch] = (cached[1], digest, replaced, appended)
+
+    rejected += tail_rejected
+    write_snapshot(snapshot_path(path, digest) + ".feather", df,
+                   {"rejected_rows": rejected, "layout": SNAPSHOT_LAYOUT})
+    return df, rejected
+
+
+# Later rows win: an invoice re-exported with a new Status/Outstanding
+# replaces the earlier row with the same Invoice ID
+def upsert_invoices(df, updates):
+    replaced = df["Invoice ID"].isin(updates["Invoice ID"])
+    merged = pd.concat([df[~replaced], updates], ignore_index=True)
+    return compact_invoices(merged), df[replaced].reset_index(drop=True)
+
+
+def compact_invoices(df):
+    # Concatenating frames whose categories differ falls back to plain text,
+    # so this is re-applied after every merge
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col in ID_COLUMNS:
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def _build_historical(path, digest):
+    from utils.lifecycle import HistoricalReport
+
+    snapshot = snapshot_path(path, digest) + ".feather"
+    sales, meta = read_snapshot(snapshot)
+    if sales is None or meta.get("layout") != HISTORICAL_LAYOUT:
+        sales, sheets = read_historical(path)
+        meta = {"sheets": sheets, "layout": HISTORICAL_LAYOUT}
+        write_snapshot(snapshot, sales, meta)
+        # The previous layout kept one Feather file per raw sheet in a folder
+        shutil.rmtree(snapshot_path(path, digest), ignore_errors=True)
+    return HistoricalReport(sales, meta["sheets"])
+
+
+# One streaming pass over the workbook (read-only mode, values only). Sheets
+# with a "Financial Year" label column and "18/19"-style year columns become
+# long rows of (Sheet, Branch, Year, Sales, Position); note cells and
+# non-numeric values are skipped. Returns the rows and every sheet name.
+@stage("read_historical", "loader")
+def read_historical(path):
+    import openpyxl
+
+    records = {"Sheet": [], "Branch": [], "Year": [], "Sales": [], "Position": []}
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheets = workbook.sheetnames
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+            if HISTORICAL_LABEL not in header:
+                continue
+            label = header.index(HISTORICAL_LABEL)
+            years = [(i, col) for i, col in enumerate(header) if "/" in col]
+            for position, row in enumerate(rows):
+                if label >= len(row) or row[label] is None:
+                    continue
+                for i, year in years:
+                    sales = _number(row[i]) if i < len(row) else None
+                    if sales is not None:
+                        records["Sheet"].append(sheet.title)
+                        records["Branch"].append(str(row[label]).strip())
+                        records["Year"].append(year)
+                        records["Sales"].append(sales)
+                        records["Position"].append(position)
+    finally:
+        workbook.close()
+
+    sales = pd.DataFrame(records).astype({"Sales": "float64", "Position": "int32"})
+    for col in ["Sheet", "Branch", "Year"]:
+        sales[col] = sales[col].astype("category")
+    return sales, sheets
+
+
+def _number(cell):
+    if isinstance(cell, bool):
+        return None
+    try:
+        value = float(cell) if isinstance(cell, (int, float)) else float(str(cell).replace(",", ""))
+    except ValueError:
+        return None
+    return value if value == value else None  # NaN
+
+
+# 3. Schema-driven parse of one invoice export. Returns the typed frame and
+# the number of rows dropped because Issue Date or Total would not parse.
+# `names` parses a headerless chunk (rows appended to an existing export).
+@stage("read_invoices", "loader")
+def read_invoices(path, branch, names=None):
+    text_cols = [col for col, kind in INVOICE_SCHEMA.items() if kind in ("text", "date")]
+    df = pd.read_csv(path, engine="c", thousands=",", dtype={col: str for col in text_cols},
+                     skipinitialspace=True, header=None if names else "infer", names=names)
+    df.columns = df.columns.str.strip()
+
+    for col, kind in INVOICE_SCHEMA.items():
+        if col not in df.columns:
+            continue
+        if kind == "date":
+            df[col] = pd.to_datetime(df[col], format=DATE_FORMAT, errors="coerce")
+        elif kind in ("amount", "id") and not pd.api.types.is_numeric_dtype(df[col]):
+            # Slow path, only hit when a file carries junk the C parser couldn't read
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace(",", "", regex=False), errors="coerce")
+        if kind == "amount":
+            df[col] = df[col].astype("float64")
+
+    total_rows = len(df)
+    df = df.dropna(subset=[col for col in REQUIRED_COLUMNS if col in df.columns]).reset_index(drop=True)
+    rejected = total_rows - len(df)
+    if "Invoice ID" in df.columns:
+        df = df.drop_duplicates(subset="Invoice ID", keep="last").reset_index(drop=True)
+
+    # The exports leave Branch blank; tag rows with the branch they came from
+    df["Branch"] = df["Branch"].fillna(branch)
+    return compact_invoices(df), rejected
+
+
+# 4. Snapshot cache
+def snapshot_path(source, digest):
+    return os.path.join(CACHE_DIR, f"{os.path.basename(source)}-{digest[:16]}")
+
+
+def read_snapshot(snapshot, columns=None):
+    if feather is None or not os.path.exists(snapshot):
+        return None, {}
+    table = feather.read_table(snapshot, columns=columns, memory_map=True)
+    meta = json.loads((table.schema.metadata or {}).get(b"dashboard", b"{}"))
+    return table.to_pandas(), meta
+
+
+def write_snapshot(snapshot, df, meta):
+    if feather is None:
+        return
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"dashboard"] = json.dumps(meta).encode()
+    table = table.replace_schema_metadata(metadata)
+    try:
+        os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+        tmp = f"{snapshot}.{os.getpid()}.tmp"
+        # Uncompressed so later reads can memory-map the columns
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, snapshot)
+    except OSError:
+        return  # read-only deploys just keep parsing the sources
+    _prune_snapshots(snapshot)
+
+
+def clear_snapshots():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    with _memo_lock:
+        _memo.clear()
+
+
+def _prune_snapshots(snapshot):
+    # Drop snapshots of older versions of the same source file
+    entry = os.path.relpath(snapshot, CACHE_DIR).split(os.sep)[0]
+    prefix = entry.rsplit("-", 1)[0]
+    for stale in glob.glob(os.path.join(CACHE_DIR, f"{glob.escape(prefix)}-*")):
+        if os.path.basename(stale).split(".feather")[0] == entry.split(".feather")[0]:
+            continue
+        if os.path.isdir(stale):
+            shutil.rmtree(stale, ignore_errors=True)
+        else:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
 
-# 2. For Weekly Trends, Benchmark, and Customer Analysis
-def load_branch_data():
-    wa_path = os.path.join(DATA_DIR, "WA.CSV")
-    nsw_path = os.path.join(DATA_DIR, "NSW.CSV")
-    qld_path = os.path.join(DATA_DIR, "QLD.CSV")
+# Returns (hash of the first `prefix` bytes, hash of the whole file) in one read
+def _file_hash(path, prefix=0):
+    digest = hashlib.sha1()
+    prefix_digest = None
+    with open(path, "rb") as f:
+        if prefix:
+            head = f.read(prefix)
+            digest.update(head)
+            if len(head) == prefix:
+                prefix_digest = digest.hexdigest()
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return prefix_digest, digest.hexdigest()
 
-    wa_df = pd.read_csv(wa_path)
-    nsw_df = pd.read_csv(nsw_path)
-    qld_df = pd.read_csv(qld_path)
 
-    return wa_df, nsw_df, qld_df
+# Bytes appended after `offset`, or None if they don't start on a fresh line
+def _read_tail(path, offset):
+    with open(path, "rb") as f:
+        f.seek(max(offset - 1, 0))
+        previous = f.read(1) if offset else b"\n"
+        tail = f.read()
+    if previous not in (b"\n", b"\r") and not tail.startswith((b"\n", b"\r")):
+        return None
+    return tail
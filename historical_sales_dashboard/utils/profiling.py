@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import logging
+import itertools
+import cProfile
+import threading
+import tracemalloc
+import weakref
+from collections import deque
+from contextlib import ContextDecorator
+
+# Per-rerun stage timings. Pages call `profile_page(name)` at the top and
+# `finish()` at the bottom; anything in between that runs inside a `stage(...)`
+# (as a context manager or decorator) is recorded against that rerun. Pages
+# that end early call `profiler.stop()` to keep the panel; after a plain
+# `st.stop()` (an error page) the next `start_run()` closes the unfinished run.
+# Stages outside a page rerun (CLI tools, background refits) cost one
+# thread-local lookup and are not recorded.
+#   with stage("weekly chart", "render"): ...
+#   @stage("load_branch", "loader")
+# DASHBOARD_PROFILE_LOG=path appends every finished rerun to a JSON-lines file.
+
+KINDS = ["loader", "transform", "model", "render"]
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", ".cache", "profiles")
+KEEP_PROFILES = 20
+LOG_FILE = os.environ.get("DASHBOARD_PROFILE_LOG")
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+_dump_ids = itertools.count()   # tells apart dumps written in the same millisecond
+_runs = deque(maxlen=200)
+_runs_lock = threading.Lock()
+
+
+class _MemoryCapture:
+    # tracemalloc and its peak are process-wide: one rerun measures at a time,
+    # and tracing runs only while it does. A run that never finishes (the page
+    # raised, or its thread went away) releases the capture when it is
+    # garbage collected.
+    def __init__(self):
+        self._lock = threading.RLock()   # the GC callback may fire while held
+        self._owner = None
+
+    def acquire(self, run):
+        with self._lock:
+            if self._owner is not None and self._owner() is not None:
+                return False
+            self._owner = weakref.ref(run, self._collected)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            return True
+
+    def peak(self, run):
+        with self._lock:
+            if self._owner is None or self._owner() is not run:
+                return None
+            return tracemalloc.get_traced_memory()[1]
+
+    def release(self, run):
+        with self._lock:
+            if self._owner is not None and self._owner() is run:
+                self._stop()
+
+    def _collected(self, ref):
+        with self._lock:
+            if self._owner is ref:
+                self._stop()
+
+    def _stop(self):
+        self._owner = None
+        tracemalloc.stop()
+
+
+_memory = _MemoryCapture()
+
+
+class stage(ContextDecorator):
+    def __init__(self, name, kind="transform"):
+        self.name = name
+        self.kind = kind
+
+    # Decorated functions get a fresh instance per call (threads, recursion)
+    def _recreate_cm(self):
+        return stage(self.name, self.kind)
+
+    def __enter__(self):
+        run = getattr(_local, "run", None)
+        self._run = run
+        if run is not None:
+            self._record = {"name": self.name, "kind": self.kind, "depth": len(run.stack)}
+            run.stack.append(self._record)
+            run.stages.append(self._record)
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._run is not None:
+            self._record["seconds"] = time.perf_counter() - self._start
+            self._run.stack.pop()
+        return False
+
+
+class PageRun:
+    def __init__(self, page, track_memory=False, capture=False):
+        self.page = page
+        self.stack = []
+        self.stages = []
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.track_memory = track_memory
+        # Another session is measuring: report no peak rather than a shared one
+        self.memory_busy = track_memory and not _memory.acquire(self)
+        self.profiler = cProfile.Profile() if capture else None
+        if self.profiler is not None:
+            self.profiler.enable()
+        self._closed = False
+
+    def summary(self):
+        # Nested stages are already counted in their parent, so kinds sum only depth 0
+        total = time.perf_counter() - self._start
+        by_kind = {kind: 0.0 for kind in KINDS}
+        for record in self.stages:
+            if record["depth"] == 0 and "seconds" in record:
+                by_kind[record["kind"]] = by_kind.get(record["kind"], 0.0) + record["seconds"]
+        by_kind["other"] = max(total - sum(by_kind.values()), 0.0)
+        result = {
+            "page": self.page,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "total_s": total,
+            "by_kind_s": by_kind,
+            "stages": [record for record in self.stages if "seconds" in record],
+        }
+        peak = _memory.peak(self) if self.track_memory else None
+        if peak is not None:
+            result["peak_memory_mb"] = peak / 2**20
+        elif self.memory_busy:
+            result["memory_busy"] = True
+        return result
+
+    def close(self):
+        # Idempotent; runs on the thread that started the run (finish(), or
+        # the next start_run() there when the page stopped early)
+        if self._closed:
+            return
+        self._closed = True
+        if getattr(_local, "run", None) is self:
+            _local.run = None
+        try:
+            if self.profiler is not None:
+                self.profiler.disable()
+        finally:
+            _memory.release(self)
+
+    def finish(self):
+        try:
+            result = self.summary()
+        finally:
+            self.close()
+        if self.profiler is not None:
+            path = _write_profile(self.profiler, self.page)
+            if path is not None:
+                result["cprofile"] = path
+        with _runs_lock:
+            _runs.append(result)
+        if LOG_FILE:
+            with open(LOG_FILE, "a") as f:
+                f.write(json.dumps(result) + "\n")
+        return result
+
+
+def start_run(page, track_memory=False, capture=False):
+    stale = getattr(_local, "run", None)
+    if stale is not None:  # a rerun on this thread that stopped before finish()
+        stale.close()
+    run = PageRun(page, track_memory, capture)
+    _local.run = run
+    return run
+
+
+def recent_runs(page=None):
+    with _runs_lock:
+        return [run for run in _runs if page is None or run["page"] == page]
+
+
+def _write_profile(profiler, page):
+    # pstats format: snakeviz, `python -m pstats` and speedscope all read it
+    now = time.time()
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now % 1 * 1000):03d}"
+    name = f"{page.replace(' ', '_')}-{stamp}-{os.getpid()}-{next(_dump_ids)}.prof"
+    path = os.path.abspath(os.path.join(PROFILE_DIR, name))
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(path)
+    except OSError as error:
+        # Read-only deploys still get the timings, just no dump to download
+        log.warning("Skipping the cProfile dump for %s: %s", page, error)
+        return None
+    # Oldest first by modification time; another session may prune the same
+    # dumps concurrently, so a file that is already gone is skipped
+    dumps = []
+    for entry in os.listdir(PROFILE_DIR):
+        try:
+            dumps.append((os.path.getmtime(os.path.join(PROFILE_DIR, entry)), entry))
+        except FileNotFoundError:
+            continue
+    for _, old in sorted(dumps)[:-KEEP_PROFILES]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, old))
+        except FileNotFoundError:
+            pass
+    return path
+
+
+# ---------------- Streamlit panel ----------------
+
+def profile_page(page):
+    """Start recording this rerun; the sidebar panel is drawn by `finish()`."""
+    import streamlit as st
+
+    panel = st.sidebar.toggle("⏱️ Profiling", key="profiling_panel", value=False)
+    capture = panel and st.session_state.pop("profiling_capture", False)
+    run = start_run(page, track_memory=panel, capture=capture)
+    return _PanelRun(run, panel, st.sidebar.container() if panel else None)
+
+
+class _PanelRun:
+    def __init__(self, run, visible, container):
+        self.run = run
+        self.visible = visible
+        self.container = container
+
+    def stop(self):
+        """`st.stop()` for profiled pages: finish this rerun (panel included) first."""
+        import streamlit as st
+
+        self.finish()
+        st.stop()
+
+    def finish(self):
+        result = self.run.finish()
+        if not self.visible:
+            return result
+        import pandas as pd
+        import streamlit as st
+
+        box = self.container
+        memory = (f" · peak {result['peak_memory_mb']:,.1f} MB" if "peak_memory_mb" in result
+                  else " · peak memory skipped (another session is measuring)" if result.get("memory_busy") else "")
+        box.caption(f"This rerun: {result['total_s'] * 1000:,.0f} ms" + memory)
+        box.dataframe(pd.Series(result["by_kind_s"], name="ms").mul(1000).round(1), width="stretch")
+        if result["stages"]:
+            stages = pd.DataFrame(result["stages"])
+            stages["name"] = stages["depth"].map(lambda d: "  " * d) + stages["name"]
+            stages["ms"] = (stages["seconds"] * 1000).round(1)
+            box.dataframe(stages[["name", "kind", "ms"]], hide_index=True, width="stretch")
+        from utils.result_cache import results
+
+        cache = results.stats()
+        box.caption(f"Shared result cache: {cache['entries']} entries, "
+                    f"{cache['bytes'] / 2**20:,.1f} / {cache['max_bytes'] / 2**20:,.0f} MB · "
+                    f"{cache['hits']} hits, {cache['waits']} waits, {cache['misses']} misses, "
+                    f"{cache['evictions']} evictions")
+        box.download_button("📥 Timing log (JSON)", json.dumps(recent_runs(), indent=2),
+                            file_name="dashboard_timings.json", mime="application/json")
+        box.button("Capture cProfile on next rerun",
+                   on_click=lambda: st.session_state.update(profiling_capture=True))
+        if "cprofile" in result:
+            with open(result["cprofile"], "rb") as f:
+                box.download_button("📥 cProfile dump (.prof)", f.read(),
+                                    file_name=os.path.basename(result["cprofile"]))
+        return result
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+from utils.loader import load_branch_data
+from utils.rollups import PerVersion, version_changes
+from utils.profiling import stage
+
+# Receivables aging index, built once per data version. Open invoices
+# (Outstanding > 0) are summed per branch x customer x status x delivery x due
+# date, so an aging query buckets a few thousand due dates instead of every
+# invoice. Days overdue are counted from each branch's own latest Issue Date
+# (the exports end on different days), not from today.
+# When a branch file only grew by appended/upserted invoices - e.g. a re-export
+# marking invoices Paid - the index is patched for the touched keys.
+#   load_receivables().aging(["WA"], by="Customer")
+
+INDEX_KEYS = ["Branch", "Customer", "Status", "Delivery", "Due Date"]
+INVOICE_COLUMNS = ["Branch", "Top Level Customer Name", "Status", "Delivery", "Due Date", "Issue Date", "Outstanding"]
+
+# Statuses left out of the receivables views by default (the Receivables
+# page's filter and the home page alert): drafts have not been sent yet
+EXCLUDED_STATUSES = ["Draft"]
+
+# Upper bound (days overdue, inclusive) of each bucket; the last is open-ended
+AGING_BUCKETS = {"Current": 0, "1-30 days": 30, "31-60 days": 60, "61-90 days": 90, "90+ days": None}
+
+
+class AgingIndex:
+    def __init__(self, version, facts, as_of):
+        self.version = version
+        self.facts = facts
+        self.as_of = as_of   # {branch: latest Issue Date}
+
+    def _slice(self, branches=None, statuses=None, customer=None):
+        facts = self.facts
+        mask = np.ones(len(facts), dtype=bool)
+        if branches is not None:
+            mask &= facts["Branch"].isin(list(branches)).to_numpy()
+        if statuses is not None:
+            mask &= facts["Status"].isin(list(statuses)).to_numpy()
+        if customer is not None:
+            mask &= (facts["Customer"] == customer).to_numpy()
+        return facts[mask]
+
+    def statuses(self):
+        return sorted(self.facts["Status"].unique())
+
+    def default_statuses(self):
+        return [status for status in self.statuses() if status not in EXCLUDED_STATUSES]
+
+    def days_overdue(self, facts):
+        as_of = facts["Branch"].map(self.as_of).astype("datetime64[us]")
+        return (as_of - facts["Due Date"]).dt.days.to_numpy()
+
+    def buckets(self, facts):
+        edges = [limit for limit in AGING_BUCKETS.values() if limit is not None]
+        labels = np.array(list(AGING_BUCKETS))
+        return labels[np.searchsorted(edges, self.days_overdue(facts), side="left")]
+
+    # Outstanding per `by` group (Branch / Customer / Status / Delivery) x bucket
+    def aging(self, branches=None, statuses=None, by="Branch", customer=None):
+        facts = self._slice(branches, statuses, customer)
+        table = (facts.assign(Bucket=self.buckets(facts))
+                 .pivot_table(index=by, columns="Bucket", values="Outstanding", aggfunc="sum", fill_value=0.0)
+                 .reindex(columns=list(AGING_BUCKETS), fill_value=0.0))
+        table.columns.name = None
+        table["Total"] = table.sum(axis=1)
+        return table.sort_values("Total", ascending=False)
+
+    def totals(self, branches=None, statuses=None):
+        facts = self._slice(branches, statuses)
+        return (pd.Series(facts["Outstanding"].to_numpy(), index=self.buckets(facts))
+                .groupby(level=0).sum().reindex(list(AGING_BUCKETS), fill_value=0.0))
+
+    def overdue(self, min_days=90, min_amount=0.0, branches=None, statuses=None):
+        """Customers owing more than `min_amount` more than `min_days` past due
+        (the aging buckets' boundary: 90 days is "61-90", 91 is "90+")."""
+        facts = self._slice(branches, statuses)
+        days = self.days_overdue(facts)
+        late = facts[days > min_days].assign(Days=days[days > min_days])
+        summary = late.groupby(["Branch", "Customer"], observed=True).agg(
+            Overdue=("Outstanding", "sum"), Invoices=("Invoices", "sum"), Oldest=("Days", "max"))
+        return summary[summary["Overdue"] > min_amount].sort_values("Overdue", ascending=False).reset_index()
+
+    # Incremental update: subtract the replaced invoices, add the new ones
+    def apply_changes(self, version, replaced, appended):
+        delta = pd.concat([_aggregate(replaced, sign=-1), _aggregate(appended)])
+        touched = pd.MultiIndex.from_frame(self.facts[INDEX_KEYS]).isin(pd.MultiIndex.from_frame(delta[INDEX_KEYS]))
+        patched = (pd.concat([self.facts[touched], delta])
+                   .groupby(INDEX_KEYS, dropna=False)[["Outstanding", "Invoices"]].sum().reset_index())
+        patched = patched[patched["Invoices"] > 0]
+        facts = pd.concat([self.facts[~touched], patched], ignore_index=True).sort_values(INDEX_KEYS)
+
+        as_of = dict(self.as_of)
+        for branch, latest in appended.groupby(appended["Branch"].astype(str))["Issue Date"].max().items():
+            as_of[branch] = max(as_of.get(branch, latest), latest)
+        return AgingIndex(version, facts.reset_index(drop=True), as_of)
+
+
+@stage("load_receivables", "transform")
+def load_receivables():
+    return _indexes.get()
+
+
+def build_receivables(version):
+    invoices = load_branch_data([branch for branch, _ in version], INVOICE_COLUMNS).concat()
+    as_of = invoices.groupby(invoices["Branch"].astype(str))["Issue Date"].max().to_dict()
+    return AgingIndex(version, _aggregate(invoices), as_of)
+
+
+def _aggregate(invoices, sign=1):
+    open_invoices = invoices[invoices["Outstanding"] > 0]
+    keys = pd.DataFrame({
+        "Branch": open_invoices["Branch"].astype(str),
+        "Customer": open_invoices["Top Level Customer Name"].astype(str),
+        "Status": open_invoices["Status"].astype(str).where(open_invoices["Status"].notna(), "Unknown"),
+        "Delivery": open_invoices["Delivery"].astype(str).where(open_invoices["Delivery"].notna(), "Unknown"),
+        # Invoices without a due date are treated as due on issue
+        "Due Date": open_invoices["Due Date"].fillna(open_invoices["Issue Date"]),
+        "Outstanding": open_invoices["Outstanding"] * sign,
+        "Invoices": sign,
+    })
+    return keys.groupby(INDEX_KEYS)[["Outstanding", "Invoices"]].sum().reset_index()
+
+
+def _patched_receivables(index, version):
+    changes = version_changes(index.version, version)
+    return index.apply_changes(version, *changes) if changes is not None else None
+
+
+_indexes = PerVersion(build_receivables, _patched_receivables)
@@ -0,0 +1,193 @@
+import os
+import time
+import fnmatch
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import loader
+from utils.branches import BRANCH_PATTERN, MANIFEST, branch_files
+from utils.rollups import load_rollups
+from utils.receivables import load_receivables
+from utils.customers import load_customer_index
+from utils import sqlstore
+from utils.kpis import refresh_kpis
+from utils.forecast import get_forecast
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # fall back to polling the source files
+    FileSystemEventHandler = object
+    Observer = None
+
+# Background data refresh. A daemon thread watches the data directory (file
+# events via watchdog when installed, otherwise polling) and waits until the
+# changed sources have stopped changing for DEBOUNCE seconds. It then re-parses
+# them and rebuilds the rollup cube, aging index, customer index, KPI
+# snapshot, branch forecasts and (if enabled) the SQL store in a worker pool,
+# all against a staged copy of the loader memo. Pages keep reading the
+# published version the whole time. When every stage has finished, the new
+# version is published with one assignment. If a stage fails (e.g. a
+# half-copied file), nothing is published and the next change retries.
+#   start_refresh_worker()       (each data page; idempotent)
+# DASHBOARD_REFRESH=0 turns it off; pages then rebuild inline as before.
+
+POLL_INTERVAL = float(os.environ.get("DASHBOARD_REFRESH_POLL", 30 if Observer is not None else 5))
+DEBOUNCE = float(os.environ.get("DASHBOARD_REFRESH_DEBOUNCE", 3))
+WORKERS = int(os.environ.get("DASHBOARD_REFRESH_WORKERS", 4))
+FORECAST_HORIZON = 12   # weeks, as on Weekly Trends
+
+log = logging.getLogger(__name__)
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_refresh_worker():
+    global _worker
+    if os.environ.get("DASHBOARD_REFRESH", "1") == "0":
+        return None
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = RefreshWorker()
+            _worker.start()
+        return _worker
+
+
+def refresh_status():
+    return dict(_worker.status) if _worker is not None else None
+
+
+def source_paths():
+    files = [*branch_files(loader.DATA_DIR).values(), loader.HISTORICAL_FILE, MANIFEST]
+    return [os.path.join(loader.DATA_DIR, name) for name in files]
+
+
+def source_signatures():
+    signatures = {}
+    for path in source_paths():
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signatures[path] = (stat.st_mtime_ns, stat.st_size)
+    return signatures
+
+
+class RefreshWorker(threading.Thread):
+    def __init__(self, poll=POLL_INTERVAL, debounce=DEBOUNCE, workers=WORKERS):
+        super().__init__(name="data-refresh", daemon=True)
+        self.poll = poll
+        self.debounce = debounce
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="refresh")
+        self.wake = threading.Event()
+        self.status = {"version": None, "refreshed_at": None, "seconds": None, "error": None}
+
+    def run(self):
+        observer = self._watch()
+        try:
+            # First pass warms the live caches (sharing the loader's locks with
+            # any page loading at the same time), once the page that started
+            # the worker has rendered; later passes are staged
+            time.sleep(self.debounce)
+            seen = source_signatures()
+            self._refresh(staged=False)
+            while True:
+                self.wake.wait(self.poll)
+                self.wake.clear()
+                if source_signatures() == seen:
+                    continue
+                # A failed refresh is retried on the next change, not every poll
+                seen = self._settle()
+                self._refresh(staged=True)
+        finally:
+            if observer is not None:
+                observer.stop()
+
+    def _settle(self):
+        # Debounce: a copy or export in progress keeps changing size/mtime
+        signatures = source_signatures()
+        while True:
+            time.sleep(self.debounce)
+            latest = source_signatures()
+            if latest == signatures:
+                return latest
+            signatures = latest
+
+    def _refresh(self, staged):
+        start = time.perf_counter()
+        try:
+            if staged:
+                with loader.staged_sources() as memo:
+                    version = self._rebuild(memo)
+                loader.publish_sources(memo)
+            else:
+                version = self._rebuild(None)
+                loader.publish_sources()
+        except Exception as error:
+            log.exception("Background data refresh failed; keeping the published data")
+            self.status["error"] = f"{type(error).__name__}: {error}"
+            return False
+        self.status = {"version": version, "refreshed_at": time.time(),
+                       "seconds": time.perf_counter() - start, "error": None}
+        return True
+
+    def _rebuild(self, memo):
+        # Each stage runs on a pool thread that parses into the same staged memo
+        def run(func, *args):
+            if memo is None:
+                return self.pool.submit(func, *args)
+            return self.pool.submit(_staged_call, memo, func, *args)
+
+        branches = run(loader.load_branch_data).result()
+        derived = [run(load_rollups), run(load_receivables), run(load_customer_index),
+                   run(loader.load_historical_report)]
+        if sqlstore.ENABLED:
+            derived.append(run(sqlstore.invoice_store))
+        for future in derived:
+            future.result()
+        version = derived[0].result().version
+
+        # KPI snapshot and forecasts both read the cube built above
+        kpis = run(refresh_kpis)
+        for future in [run(_fit_forecast, branch) for branch in branches]:
+            future.result()
+        kpis.result()
+        return version
+
+    def _watch(self):
+        if Observer is None:
+            return None
+        observer = Observer()
+        observer.schedule(_SourceEvents(self.wake), loader.DATA_DIR, recursive=False)
+        observer.daemon = True
+        try:
+            observer.start()
+        except OSError:
+            return None  # e.g. inotify limits; polling still picks up changes
+        return observer
+
+
+class _SourceEvents(FileSystemEventHandler):
+    # Any branch export (including new ones), the manifest or the workbook
+    def __init__(self, wake):
+        self.wake = wake
+
+    def on_any_event(self, event):
+        paths = [getattr(event, "src_path", ""), getattr(event, "dest_path", "")]
+        for path in filter(None, paths):
+            name = os.path.basename(os.fsdecode(path))
+            if fnmatch.fnmatch(name, BRANCH_PATTERN) or name in (MANIFEST, loader.HISTORICAL_FILE):
+                self.wake.set()
+
+
+def _staged_call(memo, func, *args):
+    with loader.staged_sources(memo):
+        return func(*args)
+
+
+def _fit_forecast(branch):
+    # Same series Weekly Trends forecasts, so the page finds the fit cached
+    weekly = load_rollups().rolling_index().weekly_totals([branch]).rename_axis("ds").reset_index(name="y")
+    if len(weekly) >= 2:
+        get_forecast(branch, weekly, horizon=FORECAST_HORIZON, wait=True)
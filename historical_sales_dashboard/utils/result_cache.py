@@ -0,0 +1,138 @@
+import os
+import sys
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+
+# Process-wide cache for page computations, shared by every session. Results
+# are keyed on (function, arguments, data version), evicted least-recently-used
+# once their estimated size passes the byte budget, and computed once when
+# several sessions ask for the same key at the same time (the others wait).
+#   @shared_result
+#   def weekly_view(branch, window): ...
+# DASHBOARD_RESULT_CACHE_MB sets the budget (default 256).
+
+DEFAULT_BUDGET = int(float(os.environ.get("DASHBOARD_RESULT_CACHE_MB", 256)) * 2**20)
+
+
+class ResultCache:
+    def __init__(self, max_bytes=DEFAULT_BUDGET):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()   # key -> (value, size)
+        self._pending = {}              # key -> Future of the computation in flight
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.waits = self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _shared(self._entries[key][0])
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+                self.misses += 1
+            else:
+                self.waits += 1
+
+        if not owner:
+            return _shared(future.result())
+
+        try:
+            value = compute()
+        except BaseException as error:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(error)
+            raise
+        with self._lock:
+            del self._pending[key]
+            self._store(key, value)
+        future.set_result(value)
+        return _shared(value)
+
+    def _store(self, key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.waits
+            return {
+                "entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "waits": self.waits, "evictions": self.evictions,
+                "hit_rate": (self.hits + self.waits) / lookups if lookups else 0.0,
+            }
+
+
+results = ResultCache()
+
+
+def shared_result(func):
+    """Cache `func` in the process-wide `results` cache, keyed on its arguments
+    and the current invoice data version. Lists/sets in the arguments are
+    normalized so (["WA", "NSW"]) and (("WA", "NSW")) share an entry."""
+    # Page scripts are re-executed every rerun, so the key uses the defining
+    # file and name rather than the function object
+    name = (func.__code__.co_filename, func.__qualname__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        from utils.rollups import data_version
+
+        key = (name, _hashable(args), _hashable(sorted(kwargs.items())), data_version())
+        return results.get_or_compute(key, lambda: func(*args, **kwargs))
+    return wrapper
+
+
+def estimate_size(value):
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True).sum() if isinstance(value, pd.DataFrame)
+                   else value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+def _shared(value):
+    # Callers get their own shallow frames/series: adding a column to one never
+    # reaches the cached object, and copy-on-write keeps the data shared
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, tuple):
+        return tuple(_shared(item) for item in value)
+    return value
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_hashable(item) for item in value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    if isinstance(value, np.ndarray):
+        return tuple(value.tolist())
+    return value
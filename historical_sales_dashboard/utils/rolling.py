@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+# Prefix sums over the rollup cube for rolling-window questions. Each branch
+# keeps only the (customer, week) cells it actually has, sorted by customer
+# then week (a CSR layout keyed customer * weeks + week), with a running sum in
+# integer cents. A customer's total over any window is then two binary
+# searches and a subtraction, and top-N is an argpartition over the customer
+# vector - independent of history length, and sized by the fact table rather
+# than branches x customers x weeks.
+#   index = load_rollups().rolling_index()
+#   index.top_customers(["WA"], num_weeks=13, n=10)
+
+
+class RollingIndex:
+    def __init__(self, facts, customers):
+        self.branches = pd.Index(sorted(facts["Branch"].astype(str).unique()))
+        self.weeks = pd.DatetimeIndex(sorted(facts["Week"].unique()), name="Week")
+        self.customers = customers
+
+        b = self.branches.get_indexer(facts["Branch"].astype(str))
+        w = self.weeks.get_indexer(facts["Week"])
+        c = facts["Customer Code"].to_numpy()
+        cents = np.rint(facts["Total"].to_numpy() * 100).astype(np.int64)
+        shape = (len(self.branches), len(self.weeks))
+        self.weekly = np.zeros(shape, dtype=np.int64)   # branch x week, cents
+        np.add.at(self.weekly, (b, w), cents)
+        self.active = np.zeros(shape, dtype=bool)
+        self.active[b, w] = True
+
+        # Per branch: sorted cell keys, running[i] = cents in the first i cells,
+        # and the customers present
+        self._cells = []
+        for row in range(len(self.branches)):
+            rows = np.flatnonzero(b == row)
+            keys = c[rows].astype(np.int64) * len(self.weeks) + w[rows]
+            order = np.argsort(keys, kind="stable")
+            running = np.zeros(len(rows) + 1, dtype=np.int64)
+            np.cumsum(cents[rows[order]], out=running[1:])
+            self._cells.append((keys[order], running, np.unique(c[rows])))
+
+    def _rows(self, branches):
+        if branches is None:
+            return np.arange(len(self.branches))
+        rows = self.branches.get_indexer(list(branches))
+        return rows[rows >= 0]
+
+    def window(self, branches, num_weeks):
+        """(start, end) week positions of the last `num_weeks` weeks in which
+        `branches` had any invoices; the window covers weeks [start, end)."""
+        positions = np.flatnonzero(self.active[self._rows(branches)].any(axis=0))
+        if not len(positions):
+            return 0, 0
+        return positions[-min(num_weeks, len(positions))], positions[-1] + 1
+
+    def customer_totals(self, branches, num_weeks):
+        start, end = self.window(branches, num_weeks)
+        totals = np.zeros(len(self.customers), dtype=np.int64)
+        for row in self._rows(branches):
+            keys, running, present = self._cells[row]
+            base = present.astype(np.int64) * len(self.weeks)
+            totals[present] += (running[np.searchsorted(keys, base + end)]
+                                - running[np.searchsorted(keys, base + start)])
+        return pd.Series(totals / 100, index=self.customers, name="Total")
+
+    def top_customers(self, branches, num_weeks, n=10):
+        totals = self.customer_totals(branches, num_weeks)
+        values = totals.to_numpy()
+        bought = np.flatnonzero(values != 0)
+        if len(bought) > n:
+            bought = bought[np.argpartition(-values[bought], n - 1)[:n]]
+        top = bought[np.argsort(-values[bought], kind="stable")]
+        return totals.iloc[top]
+
+    def weekly_totals(self, branches):
+        """Weekly sales of `branches` over the weeks they were active."""
+        rows = self._rows(branches)
+        active = self.active[rows].any(axis=0)
+        per_week = self.weekly[rows].sum(axis=0)[active] / 100
+        return pd.Series(per_week, index=self.weeks[active], name="Total")
+
+
+def rolling_mean(values, window):
+    """Trailing mean over `window` rows via one cumulative sum (NaN until full)."""
+    values = np.asarray(values, dtype="float64")
+    cumulative = np.concatenate([[0.0], values.cumsum()])
+    means = np.full(len(values), np.nan)
+    if window <= len(values):
+        means[window - 1:] = (cumulative[window:] - cumulative[:-window]) / window
+    return means
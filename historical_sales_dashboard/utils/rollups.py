@@ -0,0 +1,203 @@
+import pandas as pd
+import threading
+from collections import OrderedDict
+from utils.loader import load_branch_data, branch_versions, branch_changes
+from utils.profiling import stage
+
+# Branch x customer x week x quarter sales cube, built once per data version.
+# Weeks start on Monday (same buckets as to_period("W").start_time); quarters
+# come from the invoice date, so a week straddling two quarters is split.
+# Customers are integer-coded against a name dimension (sorted when built,
+# new names appended so existing codes never move).
+# When a branch file only grew by appended/upserted invoices, the cube is
+# patched for the touched keys instead of being rebuilt.
+
+FACT_KEYS = ["Branch", "Customer Code", "Week", "Quarter"]
+INVOICE_COLUMNS = ["Branch", "Top Level Customer Name", "Issue Date", "Total"]
+
+
+class RollupCube:
+    def __init__(self, version, facts, customers):
+        self.version = version
+        self.facts = facts
+        self.customers = customers
+        self._rolling = None
+
+    # 1. Filtering
+    def _slice(self, branches=None, customer=None, start=None, end=None):
+        facts = self.facts
+        mask = pd.Series(True, index=facts.index)
+        if branches is not None:
+            mask &= facts["Branch"].isin(list(branches))
+        if customer is not None:
+            code = self.customers.get_indexer([customer])[0]
+            mask &= facts["Customer Code"] == code
+        if start is not None:
+            mask &= facts["Week"] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= facts["Week"] <= pd.Timestamp(end)
+        return facts[mask]
+
+    # 2. Queries
+    def weekly_sales(self, branches=None, customer=None, start=None, end=None, fill_gaps=False):
+        weekly = self._slice(branches, customer, start, end).groupby("Week")["Total"].sum()
+        if fill_gaps and not weekly.empty:
+            weeks = pd.date_range(weekly.index.min(), weekly.index.max(), freq="W-MON")
+            weekly = weekly.reindex(weeks, fill_value=0.0)
+            weekly.index.name = "Week"
+        return weekly
+
+    # Series x week matrix on one Monday calendar; each series is NaN outside
+    # its own first..last invoice week and 0 for quiet weeks inside it.
+    def weekly_matrix(self, branches=None, by_customer=False):
+        facts = self._slice(branches)
+        keys = ["Branch", "Customer Code"] if by_customer else ["Branch"]
+        matrix = facts.pivot_table(index=keys, columns="Week", values="Total", aggfunc="sum",
+                                   observed=True)
+        if matrix.empty:
+            return matrix
+        calendar = pd.date_range(matrix.columns.min(), matrix.columns.max(), freq="W-MON")
+        matrix = matrix.reindex(columns=calendar)
+        observed = matrix.notna().to_numpy()
+        inside = observed.cumsum(axis=1) > 0
+        inside &= observed[:, ::-1].cumsum(axis=1)[:, ::-1] > 0
+        matrix = matrix.fillna(0.0).where(inside)
+        if by_customer:
+            matrix.index = pd.MultiIndex.from_arrays(
+                [matrix.index.get_level_values(0), self.customers[matrix.index.get_level_values(1)]],
+                names=["Branch", "Top Level Customer Name"])
+        return matrix
+
+    def quarterly_by_customer(self, branches=None, start=None, end=None):
+        facts = self._slice(branches, start=start, end=end)
+        pivot = facts.pivot_table(index="Quarter", columns="Customer Code", values="Total",
+                                  aggfunc="sum")
+        pivot.columns = self.customers[pivot.columns]
+        pivot.columns.name = "Top Level Customer Name"
+        return pivot.sort_index(axis=1)
+
+    # Prefix-sum arrays for rolling windows (utils/rolling.py), built on first
+    # use; a patched cube is a new object, so the index never goes stale
+    def rolling_index(self):
+        if self._rolling is None:
+            from utils.rolling import RollingIndex
+
+            self._rolling = RollingIndex(self.facts, self.customers)
+        return self._rolling
+
+    # 3. Incremental update: subtract the replaced invoices, add the new ones
+    def apply_changes(self, version, replaced, appended):
+        names = pd.Index(appended["Top Level Customer Name"].astype(str).unique())
+        customers = self.customers.append(pd.Index(sorted(names.difference(self.customers))))
+        customers.name = self.customers.name
+
+        delta = pd.concat([_aggregate(replaced, customers, sign=-1), _aggregate(appended, customers)])
+        facts = self.facts.assign(Branch=self.facts["Branch"].astype(str))
+        delta["Branch"] = delta["Branch"].astype(str)
+        touched = pd.MultiIndex.from_frame(facts[FACT_KEYS]).isin(pd.MultiIndex.from_frame(delta[FACT_KEYS]))
+
+        patched = (pd.concat([facts[touched], delta])
+                   .groupby(FACT_KEYS, observed=True)[["Total", "Invoices"]].sum().reset_index())
+        patched = patched[patched["Invoices"] > 0]
+        facts = pd.concat([facts[~touched], patched], ignore_index=True)
+        return RollupCube(version, _finish(facts.sort_values(FACT_KEYS)), customers)
+
+
+def data_version(branches=None):
+    return branch_versions(branches or None)
+
+
+class PerVersion:
+    """One object per data version (rollup cube, aging index, SQL store).
+
+    Holds the published version and, while utils/refresh.py stages the next
+    one, that one too, so readers of an already-built version never wait on a
+    build. `patch(latest, version)` may derive the new object from the most
+    recently built one, or return None to fall back to `build(version)`.
+    """
+
+    def __init__(self, build, patch=None, keep=2):
+        self.build = build
+        self.patch = patch
+        self.keep = keep
+        self._by_version = OrderedDict()
+        self._latest = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = data_version()
+        value = self._by_version.get(version)
+        if value is not None:
+            return value
+        with self._lock:
+            value = self._by_version.get(version)
+            if value is None:
+                if self._latest is not None and self.patch is not None:
+                    value = self.patch(self._latest, version)
+                if value is None:
+                    value = self.build(version)
+                # An object patched in place no longer matches its old version
+                for stale in [v for v, held in self._by_version.items() if held is value]:
+                    del self._by_version[stale]
+                self._by_version[version] = self._latest = value
+                while len(self._by_version) > self.keep:
+                    self._by_version.popitem(last=False)
+            return value
+
+
+@stage("load_rollups", "transform")
+def load_rollups():
+    return _cubes.get()
+
+
+def _patched_rollups(cube, version):
+    changes = version_changes(cube.version, version)
+    return cube.apply_changes(version, *changes) if changes is not None else None
+
+
+def version_changes(old_version, version):
+    """(replaced, appended) invoices between two data versions, or None when
+    any branch changed by more than an append and needs a full rebuild."""
+    if [b for b, _ in old_version] != [b for b, _ in version]:
+        return None
+    replaced, appended = [], []
+    for (branch, old), (_, new) in zip(old_version, version):
+        if old == new:
+            continue
+        changes = branch_changes(branch, old)
+        if changes is None:
+            return None
+        replaced.append(changes[0])
+        appended.append(changes[1])
+    return pd.concat(replaced), pd.concat(appended)
+
+
+def build_rollups(version):
+    invoices = load_branch_data([branch for branch, _ in version], INVOICE_COLUMNS).concat()
+    names = invoices["Top Level Customer Name"].astype(str)
+    customers = pd.Index(sorted(names.unique()), name="Top Level Customer Name")
+    return RollupCube(version, _aggregate(invoices, customers), customers)
+
+
+def _aggregate(invoices, customers, sign=1):
+    issue = invoices["Issue Date"]
+    keys = pd.DataFrame({
+        "Branch": invoices["Branch"].astype(str),
+        "Customer Code": customers.get_indexer(invoices["Top Level Customer Name"].astype(str)).astype("int32"),
+        "Week": issue.dt.normalize() - pd.to_timedelta(issue.dt.dayofweek, unit="D"),
+        "Quarter": issue.dt.to_period("Q"),
+        "Total": invoices["Total"] * sign,
+        "Invoices": sign,
+    })
+    facts = keys.groupby(FACT_KEYS, observed=True)[["Total", "Invoices"]].sum().reset_index()
+    return _finish(facts)
+
+
+def _finish(facts):
+    facts = facts.reset_index(drop=True)
+    facts["Branch"] = facts["Branch"].astype("category")
+    facts["Invoices"] = facts["Invoices"].astype("int32")
+    return facts
+
+
+_cubes = PerVersion(build_rollups, _patched_rollups)
@@ -0,0 +1,147 @@
+import os
+import sqlite3
+import threading
+import pandas as pd
+from utils.loader import INVOICE_SCHEMA, is_staging, load_branch
+from utils.rollups import PerVersion, version_changes
+from utils.profiling import stage
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Embedded query engine over all branch invoices, one `invoices` table per
+# data version, for ad-hoc SQL (notebooks, one-off reports). It holds a second
+# copy of every invoice, so it is opt-in: no page builds it - they read the
+# loader's frames, the rollup cube and the indexes - and the background
+# refresh keeps one warm only with DASHBOARD_SQL_STORE=1. Uses DuckDB when
+# installed, otherwise an in-memory SQLite database indexed on Branch, Top
+# Level Customer ID and Issue Date. DASHBOARD_SQL_ENGINE=sqlite|duckdb forces one.
+#   invoice_store().query('SELECT "Branch", SUM("Total") FROM invoices GROUP BY 1')
+
+INDEXED_COLUMNS = ["Branch", "Top Level Customer ID", "Issue Date"]
+DATE_COLUMNS = ["Issue Date", "Due Date"]
+ENABLED = os.environ.get("DASHBOARD_SQL_STORE", "0") == "1"
+
+
+class InvoiceStore:
+    def __init__(self, version, connection, engine):
+        self.version = version
+        self.connection = connection
+        self.engine = engine
+        self.lock = threading.Lock()
+
+    @stage("store.query", "transform")
+    def query(self, sql, params=()):
+        with self.lock:
+            if self.engine == "duckdb":
+                frame = self.connection.execute(sql, list(params)).df()
+            else:
+                frame = pd.read_sql_query(sql, self.connection, params=list(params))
+        for col in DATE_COLUMNS:
+            if col in frame.columns:
+                frame[col] = pd.to_datetime(frame[col])
+        return frame
+
+    def columns(self):
+        return self.query("SELECT * FROM invoices LIMIT 0").columns.tolist()
+
+    def branches(self):
+        return self.query('SELECT DISTINCT "Branch" FROM invoices ORDER BY 1')["Branch"].tolist()
+
+    def invoices(self, branches=None, customer=None, limit=None):
+        where, params = _branch_filter(branches)
+        if customer is not None:
+            where += (" AND " if where else "WHERE ") + '"Top Level Customer Name" = ?'
+            params.append(customer)
+        sql = f'SELECT * FROM invoices {where} ORDER BY "Issue Date"'
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return self.query(sql, params)
+
+    # Appended/upserted invoices: delete the replaced rows, insert the new ones
+    def apply_changes(self, version, replaced, appended):
+        with self.lock:
+            ids = replaced["Invoice ID"].tolist()
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                self.connection.execute(
+                    f'DELETE FROM invoices WHERE "Invoice ID" IN ({", ".join("?" * len(chunk))})', chunk)
+            _insert(self.connection, self.engine, _prepare(appended))
+        self.version = version
+        return self
+
+
+@stage("invoice_store", "loader")
+def invoice_store():
+    return _stores.get()
+
+
+def build_store(version):
+    engine = os.environ.get("DASHBOARD_SQL_ENGINE") or ("duckdb" if duckdb is not None else "sqlite")
+    # One branch at a time, so only a single branch is ever expanded to plain text
+    branches = [branch for branch, _ in version]
+    first = _prepare(load_branch(branches[0])) if branches else _empty_invoices()
+    if engine == "duckdb":
+        connection = duckdb.connect()
+        connection.register("invoices_frame", first)
+        connection.execute("CREATE TABLE invoices AS SELECT * FROM invoices_frame")
+        connection.unregister("invoices_frame")
+    else:
+        connection = sqlite3.connect(":memory:", check_same_thread=False)
+        first.to_sql("invoices", connection, index=False)
+    del first
+    for branch in branches[1:]:
+        _insert(connection, engine, _prepare(load_branch(branch)))
+    if engine == "sqlite":
+        for col in INDEXED_COLUMNS:
+            name = "idx_" + col.lower().replace(" ", "_")
+            connection.execute(f'CREATE INDEX {name} ON invoices ("{col}")')
+    return InvoiceStore(version, connection, engine)
+
+
+def _patched_store(store, version):
+    # Patching rewrites the published tables in place, so a version staged in
+    # the background is built as a separate store instead
+    changes = version_changes(store.version, version) if not is_staging() else None
+    return store.apply_changes(version, *changes) if changes is not None else None
+
+
+def _prepare(invoices):
+    # Plain strings (NULL for blanks) for the categorical columns and int64 for
+    # the downcast IDs, so every branch inserts with the same column types
+    invoices = invoices.copy(deep=False)
+    for col in invoices.columns:
+        if isinstance(invoices[col].dtype, pd.CategoricalDtype):
+            invoices[col] = invoices[col].astype(object).where(invoices[col].notna(), None)
+        elif pd.api.types.is_integer_dtype(invoices[col]):
+            invoices[col] = invoices[col].astype("int64")
+    return invoices
+
+
+def _empty_invoices():
+    # No branch files: an empty table with the export's columns
+    dtypes = {"text": "object", "date": "datetime64[ns]", "id": "int64", "amount": "float64"}
+    return pd.DataFrame({col: pd.Series(dtype=dtypes[kind]) for col, kind in INVOICE_SCHEMA.items()})
+
+
+def _insert(connection, engine, frame):
+    if engine == "duckdb":
+        connection.register("appended_frame", frame)
+        connection.execute("INSERT INTO invoices SELECT * FROM appended_frame")
+        connection.unregister("appended_frame")
+    else:
+        frame.to_sql("invoices", connection, index=False, if_exists="append")
+
+
+def _branch_filter(branches):
+    if branches is None:
+        return "", []
+    branches = list(branches)
+    if not branches:
+        return "WHERE 1 = 0", []
+    return f'WHERE "Branch" IN ({", ".join("?" * len(branches))})', branches
+
+
+_stores = PerVersion(build_store, _patched_store)
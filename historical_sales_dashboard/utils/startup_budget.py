@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Cold-start budget check: renders each page once in a fresh interpreter
+# (so import costs are counted) and compares the time against PAGE_BUDGETS.
+# Also reports which heavy libraries the first render pulled in.
+#   python -m utils.startup_budget [--out startup.json]
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Seconds for a full first render, excluding the one-off `import streamlit`
+PAGE_BUDGETS = {
+    "app.py": 1.5,
+    "pages/1_Lifecycle_Comparison.py": 8.0,
+    "pages/2_Weekly_Trends.py": 8.0,
+    "pages/3_Benchmark_Model.py": 5.0,
+    "pages/4_Customer_Analysis.py": 5.0,
+    "pages/5_Receivables.py": 5.0,
+}
+HEAVY_MODULES = ["prophet", "sklearn", "seaborn", "matplotlib", "pyarrow", "duckdb"]
+
+_PROBE = """
+import sys, time, json
+sys.path.insert(0, {app_dir!r})
+start = time.perf_counter()
+import pandas, streamlit
+from streamlit.testing.v1 import AppTest
+framework = time.perf_counter() - start
+before = set(sys.modules)
+start = time.perf_counter()
+at = AppTest.from_file({page!r}, default_timeout=600).run()
+render = time.perf_counter() - start
+loaded = sorted({{name.split(".")[0] for name in set(sys.modules) - before}} & set({heavy!r}))
+print(json.dumps({{"framework_s": framework, "render_s": render, "heavy_modules": loaded,
+                  "exceptions": [e.value for e in at.exception]}}))
+"""
+
+
+def measure(page):
+    probe = _PROBE.format(app_dir=APP_DIR, page=os.path.join(APP_DIR, page), heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, "-c", probe], cwd=APP_DIR, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"{page} probe failed:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure each page's cold first-render time.")
+    parser.add_argument("--out", help="write the measurements as JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for page, budget in PAGE_BUDGETS.items():
+        result = measure(page)
+        result["budget_s"] = budget
+        result["within_budget"] = result["render_s"] <= budget and not result["exceptions"]
+        results[page] = result
+        status = "ok " if result["within_budget"] else "OVER"
+        print(f"{status} {page}: {result['render_s']:.2f}s / {budget:.1f}s "
+              f"(heavy: {', '.join(result['heavy_modules']) or 'none'})")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(r["within_budget"] for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import math
+import pandas as pd
+import streamlit as st
+
+# Paged table for large styled frames. Search and sort run on the whole frame
+# (vectorized, cheap); the Styler - which builds HTML per cell - only ever sees
+# the rows on the current page, so render cost and payload size stay flat as
+# the data grows.
+#   paged_table(df, "deviation", style=lambda s: s.format({"Total": "{:,.0f}"}))
+
+PAGE_SIZES = [25, 50, 100]
+
+
+def paged_table(frame, key, style=None, page_size=25, search=True, sort=True):
+    """Render one page of `frame`; `style(styler)` is applied to that page only."""
+    frame = frame.reset_index(drop=True)
+    controls = st.columns([3, 2, 1, 1, 1])
+
+    query = controls[0].text_input("🔎 Search", key=f"{key}_search") if search else ""
+    if query:
+        frame = frame[search_mask(frame, query)]
+
+    if sort:
+        by = controls[1].selectbox("Sort by", ["(original order)", *frame.columns], key=f"{key}_sort")
+        descending = controls[2].toggle("Desc", key=f"{key}_desc")
+        if by != "(original order)":
+            frame = frame.sort_values(by, ascending=not descending, kind="stable", na_position="last")
+
+    size = controls[3].selectbox("Rows", PAGE_SIZES, index=PAGE_SIZES.index(page_size)
+                                 if page_size in PAGE_SIZES else 0, key=f"{key}_size")
+    pages = max(math.ceil(len(frame) / size), 1)
+    # A narrower search can leave the remembered page past the end
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = controls[4].number_input("Page", 1, pages, key=f"{key}_page")
+
+    start = (page - 1) * size
+    visible = frame.iloc[start:start + size]
+    st.dataframe(style(visible.style) if style else visible, hide_index=True)
+    st.caption(f"Rows {start + 1 if len(frame) else 0:,}-{start + len(visible):,} of {len(frame):,}")
+    return visible
+
+
+def search_mask(frame, query):
+    # Case-insensitive substring match over the text columns
+    mask = pd.Series(False, index=frame.index)
+    for col in frame.columns:
+        if frame[col].dtype == object or isinstance(frame[col].dtype, (pd.CategoricalDtype, pd.StringDtype)):
+            mask |= frame[col].astype(str).str.contains(query, case=False, regex=False, na=False)
+    return mask
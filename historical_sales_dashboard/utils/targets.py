@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+# Benchmark target model. Takes a branch x week matrix on one shared Monday
+# calendar (RollupCube.weekly_matrix: NaN outside each branch's own span) and
+# projects every branch from its first week at a benchmark's weekly growth
+# rate. A benchmark is one branch or a blended peer group (the mean of its
+# members' growth rates); every requested benchmark x branch pair is computed
+# in one broadcast NumPy expression.
+#   target_model(cube.weekly_matrix(), {"WA": ["WA"], "Peers": ["NSW", "QLD"]})
+
+GROWTH_METHODS = ["mean", "compound"]
+OUTPUT_COLUMNS = ["Benchmark", "Issue Date", "Branch", "Actual Sales", "Target Sales", "Difference", "Deviation %"]
+
+
+def branch_growth(matrix, method="mean"):
+    """Weekly growth rate per branch (row).
+
+    "mean": the average week-over-week % change (weeks whose previous week had
+    no sales are skipped). "compound": exp of the log-linear trend slope over
+    weeks with sales, i.e. the steady rate that best fits the whole history.
+    """
+    values = matrix.to_numpy(dtype="float64")
+    if method == "mean":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = values[:, 1:] / values[:, :-1] - 1
+        finite = np.isfinite(change)
+        counts = finite.sum(axis=1)
+        growth = np.where(finite, change, 0.0).sum(axis=1) / np.maximum(counts, 1)
+        growth[counts == 0] = np.nan
+    elif method == "compound":
+        mask = values > 0
+        y = np.log(np.where(mask, values, 1.0)) * mask
+        t = np.broadcast_to(np.arange(values.shape[1], dtype="float64"), values.shape) * mask
+        n = mask.sum(axis=1)
+        denom = n * (t * t).sum(axis=1) - t.sum(axis=1) ** 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(denom > 0, (n * (t * y).sum(axis=1) - t.sum(axis=1) * y.sum(axis=1)) / denom, np.nan)
+        growth = np.expm1(slope)
+    else:
+        raise ValueError(f"Unknown growth method {method!r}; expected one of {GROWTH_METHODS}")
+    return pd.Series(growth, index=matrix.index, name="Growth")
+
+
+def target_model(matrix, benchmarks, method="mean", include_members=False):
+    """Long frame of actual vs target sales for every benchmark x branch pair.
+
+    `benchmarks` maps a label to the branches whose growth it blends. Members
+    of a benchmark are skipped as targets unless `include_members` is set.
+    """
+    branches = list(matrix.index)
+    values = matrix.to_numpy(dtype="float64")
+    observed = ~np.isnan(values)
+    has_data = observed.any(axis=1)
+    start = np.argmax(observed, axis=1)
+    initial = values[np.arange(len(branches)), start]
+
+    # Benchmark growth = weights (benchmarks x branches) @ branch growth
+    growth = branch_growth(matrix, method).to_numpy()
+    weights = np.array([[branch in members for branch in branches] for members in benchmarks.values()], dtype="float64")
+    weights /= np.maximum(weights.sum(axis=1, keepdims=True), 1)
+    benchmark_growth = weights @ np.nan_to_num(growth)
+    benchmark_growth[(weights > 0) @ np.isnan(growth)] = np.nan
+
+    # targets[k, b, t] = initial[b] * (1 + g[k]) ** (t - start[b]) inside branch b's span
+    steps = np.arange(values.shape[1])[None, :] - start[:, None]
+    with np.errstate(over="ignore", invalid="ignore"):
+        targets = initial[None, :, None] * (1 + benchmark_growth)[:, None, None] ** steps[None, :, :]
+    targets = np.where(observed[None], targets, np.nan)
+
+    keep = has_data[None, :] & ((weights == 0) | include_members)
+    k_idx, b_idx = np.nonzero(keep)
+    if not len(k_idx):
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+    labels = np.array(list(benchmarks), dtype=object)
+    weeks = matrix.columns.to_numpy()
+    actual = values[b_idx]
+    target = targets[k_idx, b_idx]
+    valid = observed[b_idx]
+
+    rows = valid.sum(axis=1)
+    frame = pd.DataFrame({
+        "Benchmark": np.repeat(labels[k_idx], rows),
+        "Issue Date": np.broadcast_to(weeks, valid.shape)[valid],
+        "Branch": np.repeat(np.array(branches, dtype=object)[b_idx], rows),
+        "Actual Sales": actual[valid],
+        "Target Sales": target[valid],
+    })
+    frame["Difference"] = frame["Actual Sales"] - frame["Target Sales"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frame["Deviation %"] = frame["Difference"] / frame["Target Sales"] * 100
+    return frame[OUTPUT_COLUMNS]
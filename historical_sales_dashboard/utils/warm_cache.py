@@ -0,0 +1,37 @@
+import argparse
+import os
+import time
+from utils import loader
+from utils.kpis import KPI_FILE, refresh_kpis
+
+# Pre-build the columnar snapshot cache so the first page load after a deploy
+# is a memory-mapped read instead of a CSV/XLSX parse, and the home page KPI
+# snapshot is current.
+#   python -m utils.warm_cache [--rebuild]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-warm the dashboard's snapshot cache.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="discard existing snapshots and re-parse every source file")
+    args = parser.parse_args(argv)
+
+    if args.rebuild:
+        loader.clear_snapshots()
+
+    start = time.perf_counter()
+    loader.load_historical_report()
+    print(f"{loader.HISTORICAL_FILE}: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    branches = loader.load_branch_data()
+    rows = sum(len(frame) for frame in branches.values())
+    print(f"{len(branches)} branches ({', '.join(branches)}): {rows:,} rows, {time.perf_counter() - start:.2f}s")
+
+    refresh_kpis()
+    print(f"Home page KPIs: {os.path.abspath(KPI_FILE)}")
+    print(f"Snapshots written to {os.path.abspath(loader.CACHE_DIR)}")
+
+
+if __name__ == "__main__":
+    main()